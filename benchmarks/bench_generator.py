@@ -0,0 +1,39 @@
+"""Report generation throughput: per-report path vs. NumPy columnar batches.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_generator -n 200000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from intel_analysis.generator import generate_reports
+from intel_analysis.refdata import load_reference_data
+
+
+def run(data: dict, count: int, workers: int, columnar: bool, now: datetime) -> float:
+    start = time.perf_counter()
+    generated = sum(1 for _ in generate_reports(count, data, workers=workers, seed=0, now=now, columnar=columnar))
+    elapsed = time.perf_counter() - start
+    assert generated == count
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fake report generation")
+    parser.add_argument("-n", "--count", action="store", type=int, default=100_000)
+    parser.add_argument("-w", "--workers", action="store", type=int, default=1)
+    parser.add_argument("-r", "--repeat", action="store", type=int, default=3)
+    args = parser.parse_args()
+
+    data = load_reference_data("data").generator_data()
+    now = datetime.combine(datetime.today(), datetime.min.time())
+
+    results = {}
+    for name, columnar in (("per-report", False), ("columnar", True)):
+        # best of `repeat` runs
+        best = min(run(data, args.count, args.workers, columnar, now) for _ in range(args.repeat))
+        results[name] = best
+        print(f"{name:>11}: {best:7.3f}s  {args.count / best:>12,.0f} reports/s")
+    print(f"    speedup: {results['per-report'] / results['columnar']:.2f}x")
@@ -0,0 +1,219 @@
+"""Offline benchmarks for report generation, bulk ingest, search and RAG.
+
+Elasticsearch and the LLM are replaced by local fakes (benchmarks/fakes.py)
+with configurable latency, so this runs with no network. Run from the
+repository root, save the results and compare a later run against them:
+
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --baseline before.json
+"""
+import argparse
+import json
+import resource
+import statistics
+import time
+from datetime import datetime
+
+from elasticsearch import Elasticsearch
+
+from benchmarks.fakes import FakeElasticsearch, FakeLLM
+from intel_analysis.bulk import IngestOptions
+from intel_analysis.cache import QueryCache
+from intel_analysis.clients import ES_CONNECTIONS_PER_NODE, connect_self_hosted_llm
+from intel_analysis.generator import generate_reports
+from intel_analysis.ingest import bulk_ingest, report_stream
+from intel_analysis.local_index import LocalIndex
+from intel_analysis.queries import NUM_RESULTS
+from intel_analysis.query_compiler import compile_filters
+from intel_analysis.refdata import load_reference_data
+from intel_analysis.search import SearchService
+from intel_analysis.serialization import dumps, es_serializers
+
+INDEX = "intel-benchmark"
+QUERIES = [
+    "cyber attack on financial institutions",
+    "terrorist plot targeting government buildings",
+    "What is the latest intelligence on chemical weapons?",
+    "smuggling routes",
+]
+FILTERS = [
+    {"date_range": "All Time", "classifications": [], "sources": [], "countries": [], "compartments": []},
+    {"date_range": "Last 30 Days", "classifications": ["SUPER SECRET"], "sources": [], "countries": [], "compartments": []},
+    {
+        "date_range": "This Year",
+        "classifications": [],
+        "sources": ["Human intelligence (HUMINT)", "Signals intelligence (SIGINT)"],
+        "countries": ["Iran"],
+        "compartments": [],
+    },
+]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latency_stats(samples: list) -> dict:
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "per_sec": len(samples) / sum(samples),
+    }
+
+
+def timed(fn, iterations: int) -> list:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_generate(data: dict, count: int, columnar: bool) -> dict:
+    now = datetime(2024, 6, 1)
+    start = time.perf_counter()
+    for _ in generate_reports(count, data, seed=0, now=now, columnar=columnar):
+        pass
+    return {"docs_per_sec": count / (time.perf_counter() - start)}
+
+
+def bench_serialize(docs: list) -> dict:
+    start = time.perf_counter()
+    size = sum(len(dumps(doc)) for doc in docs)
+    elapsed = time.perf_counter() - start
+    return {"docs_per_sec": len(docs) / elapsed, "bytes_per_sec": size / elapsed}
+
+
+def bench_filters(iterations: int) -> dict:
+    def cold(i):
+        # a compartment no earlier call used misses the compiled-filter cache
+        compile_filters(FILTERS[i % len(FILTERS)] | {"compartments": [f"UNSEEN-{i}"]})
+
+    def warm(i):
+        compile_filters(FILTERS[i % len(FILTERS)])
+
+    return {"cold_per_sec": latency_stats(timed(cold, iterations))["per_sec"], "warm_per_sec": latency_stats(timed(warm, iterations))["per_sec"]}
+
+
+def bench_ingest(es, fake_es: FakeElasticsearch, reference_data, count: int, workers: int, columnar: bool) -> dict:
+    received = fake_es.bytes_received
+    start = time.perf_counter()
+    docs = report_stream(reference_data, count, workers=workers, seed=0, columnar=columnar)
+    indexed, errors = bulk_ingest(es, INDEX, docs, IngestOptions(), force_merge=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "docs_per_sec": indexed / elapsed,
+        "bytes_per_sec": (fake_es.bytes_received - received) / elapsed,
+        "errors": len(errors),
+    }
+
+
+def search_fn(searcher: SearchService, method: str):
+    # the app's path: filter compilation, the query cache (if any), the search and hit parsing
+    search = getattr(searcher, method)
+
+    def run(i):
+        return search(QUERIES[i % len(QUERIES)], FILTERS[i % len(FILTERS)])
+
+    return run
+
+
+def bench_local_index(reference_data, count: int, iterations: int) -> tuple:
+    start = time.perf_counter()
+    index = LocalIndex(report_stream(reference_data, count, seed=0, columnar=True))
+    build = {"docs_per_sec": index.count / (time.perf_counter() - start)}
+    searcher = SearchService(None, INDEX, None, "benchmark", backend=index)
+    return build, latency_stats(timed(search_fn(searcher, "basic"), iterations))
+
+
+def bench_rag(searcher: SearchService, iterations: int) -> dict:
+    # SearchService.rag end to end: ELSER retrieval, prompt, retried completion, usage and cache
+    prompt_times = []
+    build_prompt = searcher.build_prompt
+
+    def timed_prompt(es_hits: list, query_text: str) -> str:
+        start = time.perf_counter()
+        prompt = build_prompt(es_hits, query_text)
+        prompt_times.append(time.perf_counter() - start)
+        return prompt
+
+    searcher.build_prompt = timed_prompt
+    stats = latency_stats(timed(search_fn(searcher, "rag"), iterations))
+    stats["prompt_p50_ms"] = statistics.median(prompt_times) * 1000
+    return stats
+
+
+def run_suite(args) -> dict:
+    reference_data = load_reference_data("data")
+    data = reference_data.generator_data()
+    results = {}
+
+    results["generate.per_report"] = bench_generate(data, args.count, columnar=False)
+    results["generate.columnar"] = bench_generate(data, args.count, columnar=True)
+    docs = list(generate_reports(min(args.count, 50_000), data, seed=0, now=datetime(2024, 6, 1)))
+    results["serialize"] = bench_serialize(docs)
+    results["compile_filters"] = bench_filters(args.iterations * 10)
+    results["rss_after_generation"] = {"peak_rss_mb": peak_rss_mb()}
+
+    fake_es = FakeElasticsearch(reference_data.precanned_documents() * NUM_RESULTS, latency_ms=args.es_latency_ms).start()
+    fake_llm = FakeLLM(latency_ms=args.llm_latency_ms).start()
+    try:
+        es = Elasticsearch(fake_es.url, connections_per_node=ES_CONNECTIONS_PER_NODE, serializers=es_serializers())
+        llm = connect_self_hosted_llm(f"{fake_llm.url}/v1", "benchmark")
+
+        results["ingest"] = bench_ingest(es, fake_es, reference_data, args.count, args.workers, args.columnar)
+        searcher = SearchService(es, INDEX, llm, "benchmark")
+        for method in ("basic", "elser", "hybrid"):
+            results[f"search.{method}"] = latency_stats(timed(search_fn(searcher, method), args.iterations))
+        # repeats of the same few query/filter pairs, answered from the query cache
+        cached = SearchService(es, INDEX, llm, "benchmark", query_cache=QueryCache())
+        results["search.basic_cached"] = latency_stats(timed(search_fn(cached, "basic"), args.iterations))
+        results["rag"] = bench_rag(searcher, args.iterations)
+    finally:
+        fake_es.stop()
+        fake_llm.stop()
+
+    # the in-process BM25 backend, over the same number of reports
+    results["local_index.build"], results["search.local"] = bench_local_index(reference_data, args.count, args.iterations)
+
+    results["rss_total"] = {"peak_rss_mb": peak_rss_mb()}
+    return results
+
+
+def print_results(results: dict, baseline: dict | None = None):
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            line = f"{name:<22} {metric:<16} {value:>14,.2f}"
+            previous = (baseline or {}).get(name, {}).get(metric)
+            if previous:
+                line += f"  ({(value - previous) / previous:+.1%} vs baseline)"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks against local Elasticsearch and LLM fakes")
+    parser.add_argument("-n", "--count", action="store", type=int, default=50_000, help="reports to generate and ingest")
+    parser.add_argument("-i", "--iterations", action="store", type=int, default=200, help="searches/RAG queries per method")
+    parser.add_argument("-w", "--workers", action="store", type=int, default=1)
+    parser.add_argument("--columnar", action="store_true", default=False, help="ingest NumPy columnar reports")
+    parser.add_argument("--es-latency-ms", action="store", type=float, default=2)
+    parser.add_argument("--llm-latency-ms", action="store", type=float, default=20)
+    parser.add_argument("-o", "--output", action="store", help="write results as JSON")
+    parser.add_argument("-b", "--baseline", action="store", help="JSON results to compare against")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": datetime.now().isoformat(), "args": vars(args), "results": results}, f, indent=2)
@@ -0,0 +1,158 @@
+"""Local stand-ins for Elasticsearch and an OpenAI-compatible LLM endpoint.
+
+Both speak just enough HTTP for the project's clients, answer after a
+configurable latency and count the requests and bytes they receive, so
+benchmarks run without any network access.
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from intel_analysis.serialization import dumps, loads
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency_ms: float = 0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += size
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; avoid 40ms delayed-ACK stalls
+    disable_nagle_algorithm = True
+    headers_sent = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.record(len(body))
+        return body
+
+    def _reply(self, payload, status: int = 200):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in self.headers_sent.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._body()
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        for name, value in self.headers_sent.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_GET(self):
+        self.handle_request(self._body())
+
+    do_POST = do_PUT = do_DELETE = do_GET
+
+
+class FakeElasticsearchHandler(_Handler):
+    headers_sent = {"X-Elastic-Product": "Elasticsearch"}
+
+    def handle_request(self, body: bytes):
+        path = self.path.split("?")[0]
+        if path == "/":
+            self._reply({"name": "fake", "cluster_name": "fake", "version": {"number": "9.0.0", "build_flavor": "default"}, "tagline": "You Know, for Search"})
+        elif path.endswith("/_bulk"):
+            count = body.count(b"\n") // 2
+            self._reply({"took": 1, "errors": False, "items": [{"index": {"status": 201}}] * count})
+        elif path.endswith("/_search"):
+            self._reply(self.server.search_response(loads(body) if body else {}))
+        elif path.startswith("/_ml/trained_models/") and path.endswith("/_infer"):
+            docs = loads(body)["docs"]
+            self._reply({"inference_results": [{"predicted_value": self.server.expand(doc["text_field"])} for doc in docs]})
+        elif "/_settings" in path and self.command == "GET":
+            index = path.strip("/").split("/")[0]
+            self._reply({index: {"settings": {"index": {}}}})
+        else:
+            # settings updates, refresh, forcemerge, index/template/pipeline management
+            self._reply({"acknowledged": True})
+
+
+class FakeElasticsearch(FakeServer):
+    """Accepts bulk requests and answers searches with `docs`."""
+
+    def __init__(self, docs: list, latency_ms: float = 0):
+        super().__init__(FakeElasticsearchHandler, latency_ms)
+        self.docs = docs
+
+    @staticmethod
+    def expand(text: str) -> dict:
+        return {word: 1.0 for word in re.findall(r"\w+", text.lower())[:50]}
+
+    def search_response(self, query: dict) -> dict:
+        hits = [
+            {"_id": str(i), "_score": 1.0, "_source": doc, "highlight": {"details": [doc["details"]]}}
+            for i, doc in enumerate(self.docs[: query.get("size", 10)])
+        ]
+        return {"took": 1, "timed_out": False, "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}
+
+
+class FakeLLMHandler(_Handler):
+    def handle_request(self, body: bytes):
+        request = loads(body) if body else {}
+        if self.path.split("?")[0].endswith("/chat/completions"):
+            self._reply(self.server.completion(request))
+        else:
+            self._reply({"object": "list", "data": []})
+
+
+class FakeLLM(FakeServer):
+    """OpenAI-compatible /chat/completions returning a fixed answer."""
+
+    def __init__(self, latency_ms: float = 0, answer: str = "This is a benchmark answer."):
+        super().__init__(FakeLLMHandler, latency_ms)
+        self.answer = answer
+
+    def completion(self, request: dict) -> dict:
+        prompt_chars = sum(len(message.get("content", "")) for message in request.get("messages", []))
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 8, "total_tokens": prompt_chars // 4 + 8},
+        }
@@ -1,16 +1,37 @@
 import argparse
-import json
 import logging
-import random
-import time
 import tomllib
-from datetime import datetime, timedelta
-import uuid
+from datetime import datetime
 
 import streamlit as st
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import streaming_bulk, BulkIndexError
-from openai import AzureOpenAI, OpenAI
+from elasticsearch import ConnectionError as ESConnectionError
+from openai import BadRequestError
+
+from intel_analysis.async_search import AsyncSearchEngine
+from intel_analysis import ingest
+from intel_analysis.backends import UnsupportedQuery
+from intel_analysis.bulk import IngestOptions
+from intel_analysis.cache import QueryCache
+from intel_analysis.clients import ClientRegistry, use_local_search
+from intel_analysis.content_filter import ContentFilteredError, is_filtered
+from intel_analysis.embeddings import EmbeddingCache
+from intel_analysis.expansion import ExpansionCache
+from intel_analysis.llm_cache import LLMResponseCache
+from intel_analysis.local_index import LocalIndex, build_local_index
+from intel_analysis.metrics import REGISTRY, record_usage, start_metrics_server
+from intel_analysis.prompts import LLM_SYSTEM_PROMPT
+from intel_analysis.query_compiler import compile_filters
+from intel_analysis.refdata import ReferenceDataStore
+from intel_analysis.reindex import Reindexer
+from intel_analysis.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryError,
+    RetryPolicy,
+    openai_retryable,
+)
+from intel_analysis.search import SearchService
+from intel_analysis.tracing import Trace, span, trace
 
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
@@ -23,359 +44,297 @@ today = datetime.today().strftime("%A, %B %d, %Y")
 
 st.set_page_config(page_title="GenAI-Powered Intelligence Analysis", page_icon="🔍")
 
-with open(".streamlit/style.html", "r") as f:
-  style = f.read()
-  
-st.markdown(style, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_reference_data_store() -> ReferenceDataStore:
+    # loaded once per process; reloaded only when one of the files changes
+    return ReferenceDataStore("data", ".streamlit/style.html")
 
-def connect_open_ai(api_key: str, api_version: str, endpoint: str, deployment: str) -> AzureOpenAI:
-    open_ai_client = AzureOpenAI(
-        api_key=api_key,
-        api_version=api_version,
-        azure_endpoint=endpoint,
-        azure_deployment=deployment,
-    )
-    return open_ai_client
 
+reference_data = get_reference_data_store().get()
+st.markdown(reference_data.style, unsafe_allow_html=True)
 
-def connect_self_hosted_llm(base_url: str, api_key: str) -> OpenAI:
-    open_ai_client = OpenAI(
-        base_url=config["LOCAL_LLM_URL"], 
-        api_key=config["LOCAL_LLM_API_KEY"]
-    )
-    return open_ai_client
 
+@st.cache_resource
+def get_clients(config: dict) -> ClientRegistry:
+    return ClientRegistry(config)
 
-def connect_es(config: dict) -> Elasticsearch:
-    if "ELASTIC_API_KEY" in config:
-        try:
-            client = Elasticsearch(
-                cloud_id=config["ELASTIC_CLOUD_ID"],
-                api_key=config["ELASTIC_API_KEY"]
-            )
-            # Test the connection
-            client.info()
-            return client
-        except Exception:
-            pass
-    if "ELASTIC_USER" in config and "ELASTIC_PASSWORD" in config:
-        try:
-            client = Elasticsearch(
-                cloud_id=config["ELASTIC_CLOUD_ID"],
-                basic_auth=(config["ELASTIC_USER"], config["ELASTIC_PASSWORD"])
-            )
-            # Test the connection
-            client.info()
-            return client
-        except Exception:
-            pass 
-    raise Exception("Failed to connect to Elasticsearch with provided credentials.")
-
-
-def setup_es(es, reset):
-    if reset and es.indices.exists(index=config["ELASTIC_INDEX"]):
-        logging.info("Deleting existing index")
-        es.indices.delete(index=config["ELASTIC_INDEX"])
-
-    if not es.indices.exists(index=config["ELASTIC_INDEX"]):
-        logging.info("Creating index")
-        mapping = {
-            # "_source": {
-            #     "excludes": [
-            #         "details_embeddings"
-            #     ]
-            # },
-            "properties": {
-                "classification": {"type": "keyword"},
-                "compartments": {"type": "keyword"},
-                "date": {"type": "date"},
-                "details": {"type": "text"},
-                "details_embeddings": {"type": "sparse_vector"},
-                "report_id": {"type": "keyword"},
-                "source": {"type": "keyword"},
-                "group": {"type": "keyword"},
-                "summary": {"type": "text"},
-                "country.name": {"type": "keyword"},
-                "country.coordinates": {"type": "geo_point"},
-                "country.code": {"type": "keyword"},
-            }
-        }
-        settings = {
-            "index": {
-                # "number_of_shards": "2",
-                # "number_of_replicas": "0",
-                # "refresh_interval": "-1",
-                "default_pipeline": "intel-workshop"
-            }
-        }
-        es.indices.create(index=config["ELASTIC_INDEX"], mappings=mapping, settings=settings)
-
-    logging.info("Creating/updating ingest pipeline")
-    processors = [
-        {
-            "inference": {
-                "model_id": ".elser_model_2_linux-x86_64",
-                "input_output": [
-                    {
-                        "input_field": "details",
-                        "output_field": "details_embeddings"
-                    }
-                ]
-            }
-        }
-    ]
-    es.ingest.put_pipeline(id="intel-workshop", processors=processors)
-    return True
+
+@st.cache_resource
+def get_retry_policies(max_attempts: int, deadline: float) -> tuple:
+    # shared so the circuit breakers and retry counters cover every session
+    llm_retry = RetryPolicy(
+        "LLM", max_attempts=max_attempts, deadline=deadline, breaker=CircuitBreaker("LLM")
+    )
+    es_retry = RetryPolicy(
+        "Elasticsearch", max_attempts=max_attempts, deadline=deadline, breaker=CircuitBreaker("Elasticsearch")
+    )
+    return llm_retry, es_retry
+
+
+@st.cache_resource
+def get_async_engine(config: dict, _expansions: ExpansionCache | None) -> AsyncSearchEngine:
+    return AsyncSearchEngine(
+        config,
+        retrieval_timeout=config.get("ASYNC_RETRIEVAL_TIMEOUT_SECONDS", 10),
+        llm_timeout=config.get("ASYNC_LLM_TIMEOUT_SECONDS", 60),
+        expansions=_expansions,
+        es_retry=RetryPolicy(
+            "Elasticsearch (async)",
+            max_attempts=config.get("RETRY_MAX_ATTEMPTS", 4),
+            deadline=config.get("RETRY_DEADLINE_SECONDS", 30),
+            breaker=CircuitBreaker("Elasticsearch (async)"),
+        ),
+        llm_retry=RetryPolicy(
+            "LLM (async)",
+            max_attempts=config.get("RETRY_MAX_ATTEMPTS", 4),
+            deadline=config.get("RETRY_DEADLINE_SECONDS", 30),
+            breaker=CircuitBreaker("LLM (async)"),
+        ),
+    )
 
 
-def read_config(config_path: str) -> dict:
-    with open(config_path, "rb") as f:
-        config = tomllib.load(f)
+@st.cache_resource
+def get_query_cache(maxsize: int, ttl: float) -> QueryCache:
+    # shared by every session so repeat searches skip the cluster entirely
+    return QueryCache(maxsize=maxsize, ttl=ttl)
 
-    return config
 
+@st.cache_resource
+def get_expansion_cache(maxsize: int) -> ExpansionCache:
+    return ExpansionCache(maxsize=maxsize)
 
-def read_file(file_name):
-    with open(file_name, "r") as file:
-        data = json.load(file)
-    return data
 
+@st.cache_resource
+def get_llm_cache(path: str, max_entries: int) -> LLMResponseCache:
+    return LLMResponseCache(path, max_entries=max_entries)
 
-def generate_selector():
-    return str(uuid.uuid4())
 
-def bulk_ingest(es, index, docs):
-    x = 0
-    progress_bar = st.sidebar.progress(0, text="Working...")
-    try:
-        logging.info("Sending docs to ES")
-        for ok, action in streaming_bulk(
-            client=es, index=index, actions=yield_doc(docs), chunk_size=10
-        ):
-            if ok:
-                x += 1
-                progress_bar.progress(x / len(docs), text=f"Ingested {x} documents...")
-            else:
-                logging.error(f"{ok} {action}")
-        return True, None
-    except BulkIndexError as e:
-        print(f"{len(e.errors)} document(s) failed to index.")
-        for error in e.errors:
-            print(error)
-        return False, e.errors[0]
+@st.cache_resource
+def get_local_index(count: int) -> LocalIndex:
+    # built once per process from freshly generated reports; not refreshed by Data Setup
+    return build_local_index(reference_data, count)
 
 
-def yield_doc(docs):
-    for doc in docs:
-        yield json.dumps(doc)
+@st.cache_resource
+def get_embedding_cache(path: str) -> EmbeddingCache:
+    return EmbeddingCache(path)
 
 
-def random_date():
-    current_datetime = datetime.now()
+@st.cache_resource
+def get_metrics_server(port: int):
+    # one scrape endpoint per process, whatever the number of sessions
+    return start_metrics_server(port)
 
-    random_timedelta = timedelta(
-        days=random.randint(0, 365),
-        hours=random.randint(0, 23),
-        minutes=random.randint(0, 59),
-        seconds=random.randint(0, 59),
-        microseconds=random.randint(0, 999999)
-    )
 
-    random_datetime = current_datetime - random_timedelta
-    return random_datetime.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+def register_metrics():
+    # cache and retry counters are read from their own stats at scrape time
+    caches = {"query": query_cache, "elser_expansion": expansion_cache, "llm": llm_cache}
 
+    def cache_requests():
+        values = {}
+        for name, cache in caches.items():
+            if cache is not None:
+                values[(name, "hit")] = cache.hits
+                values[(name, "miss")] = cache.misses
+        return values
 
-def generate_summary(details):
-    sentences = details.split(". ")
-    if len(sentences) > 1:
-        summary = sentences[0] + "."
-    else:
-        summary = details
-    return summary
-
-
-def create_report(i):
-    country = random.choice(countries)
-    group = random.choice(groups)
-    details = random.choice(details_options).format(country["name"], group, generate_selector())
-    summary = generate_summary(details)
-    report = {
-        "report_id": f"INT-2024-{i+1:03d}",
-        "date": random_date(),
-        "source": random.choice(sources),
-        "group": group,
-        "country.name": country["name"],
-        "country.coordinates": country["coordinates"],
-        "country.code": country["code"],
-        "summary": summary,
-        "details": details,
-        "classification": random.choice(classifications),
-        "compartments": random.sample(compartments, random.randint(1, 4))
-    }
-    return report
+    def retry_counts(key):
+        return lambda: {(policy.name,): policy.stats()[key] for policy in (llm_retry, es_retry)}
 
+    REGISTRY.callback("intel_cache_requests_total", "Cache lookups by result", "counter", ("cache", "result"), cache_requests)
+    REGISTRY.callback("intel_retries_total", "Retried calls (including content-filter retries)", "counter", ("policy",), retry_counts("retries"))
+    REGISTRY.callback("intel_retry_give_ups_total", "Calls that ran out of retries", "counter", ("policy",), retry_counts("give_ups"))
+    REGISTRY.callback(
+        "intel_rebuild_documents_indexed", "Documents indexed by the current or last index rebuild", "gauge", (),
+        lambda: {(): reindexer.job.snapshot()["indexed"]} if reindexer.job is not None else {},
+    )
 
-def parse_filters(filters: dict) -> dict:
-    must = []
 
-    # parse date range
-    if filters["date_range"] == "Last 30 Days":
-        date_filter = {"range": {"date": {"gte": "now-30d"}}}
-        must.append(date_filter)
-    elif filters["date_range"] == "This Year":
-        date_filter = {"range": {"date": {"gte": "2024-01-01"}}}
-        must.append(date_filter)
+@st.cache_resource
+def get_reindexer() -> Reindexer:
+    # one rebuild at a time across every session
+    return Reindexer()
 
-    # parse countries selection
-    if len(filters["countries"]) > 0:
-        country_filter = {"terms": {"country.name": filters["countries"]}}
-        must.append(country_filter)
 
-    # parse classifications selection
-    if len(filters["classifications"]) > 0:
-        classification_filter = {"terms": {"classification": filters["classifications"]}}
-        must.append(classification_filter)
+def read_config(config_path: str) -> dict:
+    with open(config_path, "rb") as f:
+        config = tomllib.load(f)
 
-    # parse sources selection
-    if len(filters["sources"]) > 0:
-        source_filter = {"terms": {"source": filters["sources"]}}
-        must.append(source_filter)
+    return config
 
-    # parse compartments selection
-    if len(filters["compartments"]) > 0:
-        compartment_filter = {"terms": {"compartments": filters["compartments"]}}
-        must.append(compartment_filter)
 
-    final_filters = {"bool":{"must":must}}
-    return final_filters
+def start_rebuild():
+    # generation and ingest run on the job's thread; the alias only moves once the new index is warm
+    options = IngestOptions.from_config(config)
+    embeddings = None
+    if "EMBEDDING_CACHE_PATH" in config:
+        # docs arrive with their ELSER tokens and skip the inference pipeline
+        embeddings = get_embedding_cache(config["EMBEDDING_CACHE_PATH"])
+        options.pipeline = "_none"
+    try:
+        reindexer.start(
+            es,
+            config["ELASTIC_INDEX"],
+            lambda: ingest.report_stream(
+                reference_data, config["NUM_REPORTS"], workers=config.get("GENERATOR_WORKERS", 1),
+                es=es, embeddings=embeddings,
+                template_embeddings=config.get("TEMPLATE_EMBEDDINGS", "false").lower() == "true",
+                columnar=config.get("GENERATOR_COLUMNAR", "false").lower() == "true",
+            ),
+            config["NUM_REPORTS"] + len(reference_data.precanned_events),
+            options,
+            on_swap=query_cache.invalidate,
+        )
+    except RuntimeError as e:
+        st.sidebar.warning(str(e))
+
+
+def rebuild_status(was_running: bool):
+    job = reindexer.job
+    if job is None:
+        return
+    status = job.snapshot()
+    if job.running:
+        st.progress(
+            min(status["indexed"] / status["total"], 1.0),
+            text=f"{status['status'].capitalize()} {status['index']}: {status['indexed']} of {status['total']} documents ({status['elapsed']:.0f}s)",
+        )
+    elif status["status"] == "failed":
+        st.error(f"Rebuilding {status['index']} failed: {status['error']}")
+    else:
+        st.markdown(f"**Done!** {status['indexed']} documents in {status['elapsed']:.0f}s")
+        if status["errors"]:
+            st.write(f"{status['errors']} document(s) failed to index.")
+    if was_running and not job.running:
+        # stop polling
+        st.rerun()
 
 
 def elasticsearch_basic(query_text: str, filters: dict) -> dict:
-    logging.info(f"Performing Elasticsearch basic query for user search: {query_text}")
-    search_filters = parse_filters(filters)
-    es_query = {
-        "size": 3,
-        "retriever": {
-            "standard": {
-                "query": {
-                    "query_string": {
-                        "default_field": "details",
-                        "query": query_text,
-                    }
-                },
-                "filter": search_filters
-            }
-        },
-        "highlight": {
-            "pre_tags": ["**:violet-background["],
-            "post_tags": ["]**"],
-            "fields": {"details": {"number_of_fragments": 0}},
-        },
-    }
-    res = es.search(index=config["ELASTIC_INDEX"], body=es_query)
-    hits = [hit["_source"] | hit["highlight"] for hit in res["hits"]["hits"]]
-    return {"source_docs": hits}
+    return searcher.basic(query_text, filters)
 
 
 def elasticsearch_elser(query_text: str, filters: dict) -> dict:
-    logging.info(
-        f"Performing Elasticsearch sparse vector query for user search: {query_text}"
-    )
+    return searcher.elser(query_text, filters)
 
-    search_filters = parse_filters(filters)
-    es_query = {
-        "size": 3,
-        "retriever": {
-            "standard": {
-                "query": {
-                    "sparse_vector": {
-                        "field": "details_embeddings",
-                        "inference_id": ".elser_model_2_linux-x86_64",
-                        "query": query_text,
-                    }
-                },
-                "filter": search_filters
-            }
-        },
-    }
-    res = es.search(index="intel-reports", body=es_query)
-    hits = [hit["_source"] for hit in res["hits"]["hits"]]
-    return {"source_docs": hits}
+
+def elasticsearch_hybrid(query_text: str, filters: dict) -> dict:
+    return searcher.hybrid(query_text, filters)
+
+
+def build_rag_prompt(es_hits: list, query_text: str) -> str:
+    return searcher.build_prompt(es_hits, query_text)
 
 
 def llm(query_text: str) -> dict:
-    logging.info(f"Performing LLM passthrough query for user search: {query_text}")
-
-    response = open_ai_client.chat.completions.create(
-        model=model_name,
-        temperature=0,
-        messages=[
-            {
-                "role": "system",
-                "content": """
-                    Assistant is a large language model trained by OpenAI. 
-                    Be succint, answer in 15 words or less. 
-                    If you don't know the answer, say that you don't know. 
-                    Don't hallucinate. 
-                    Don't ask follow up questions.
-                    Do not include the number of words in your response.
-                """,
-            },
-            {"role": "user", "content": query_text},
-        ],
-    )
-    return {"llm_response": response.choices[0].message.content.strip()}
-
-
-def rag(query_text: str, filters: dict) -> dict:
-    logging.info(f"Performing RAG query for user search: {query_text}")
-    es_hits = elasticsearch_elser(query_text, filters)["source_docs"]
-    prompt = f"""
-        Intelligence Reports:
-        {str(es_hits)}
-
-        Instructions:
-        Answer the user's question using the intelligence reports text above only.
-        Answer as if you are addressing a US intelligence analyst or Military officer.
-        Keep in mind today's date is {today}.
-        Keep your answer grounded in the facts of the intelligence reports.
-        Summarize the intelligence report's details field and respond using 20 words or less.
-        Do not include the number of words in your response.
-    """
-
-    logging.info(
-        "Performing RAG search step 2 to LLM using Elasticsearch results as context"
+    return searcher.llm(query_text)
+
+
+def rag(query_text: str, filters: dict, retriever=None) -> dict:
+    retriever = retriever or elasticsearch_elser
+    if async_engine is not None and retriever is elasticsearch_elser:
+        # lexical and ELSER retrieval run concurrently; their hits are merged as context
+        search_filters = compile_filters(filters)
+        # the stages run on the engine's loop thread; only the total is traced here
+        with span("rag.async"):
+            return async_engine.run(
+                async_engine.rag(query_text, search_filters, build_rag_prompt, llm_cache)
+            )
+
+    return searcher.rag(query_text, filters, retriever)
+
+
+def open_stream(messages: list):
+    global stream_usage
+    request = {"temperature": 0, "model": model_name, "messages": messages, "stream": True}
+    if stream_usage:
+        try:
+            # token counts arrive in a last chunk with no choices
+            return open_ai_client.chat.completions.create(**request, stream_options={"include_usage": True})
+        except BadRequestError as e:
+            # older Azure api-versions (e.g. 2024-02-01) reject stream_options
+            if "stream_options" not in str(e):
+                raise
+            logging.warning("The LLM endpoint doesn't support stream_options; streamed token usage won't be recorded")
+            stream_usage = False
+    return open_ai_client.chat.completions.create(**request)
+
+
+def stream_completion(messages: list):
+    # yields content deltas as they arrive; raises ContentFilteredError as soon as
+    # a chunk is flagged so the caller can discard the partial answer
+    stream = open_stream(messages)
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            record_usage(chunk)
+        # Azure sends prompt filter results in a first chunk with no choices
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        cfr = getattr(choice, "content_filter_results", None)
+        if choice.finish_reason == "content_filter" or (cfr and is_filtered(cfr)):
+            raise ContentFilteredError()
+        if choice.delta and choice.delta.content:
+            yield choice.delta.content
+
+
+def stream_answer(messages: list, cache_key: str):
+    # yields the answer so far; an empty string means a filtered attempt was
+    # thrown away and the answer is starting over
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    for attempt in llm_retry.attempts():
+        answer = ""
+        try:
+            for delta in stream_completion(messages):
+                answer += delta
+                yield answer
+        except ContentFilteredError:
+            logging.warning("Failed due to content filtering. Retrying")
+            yield ""
+            continue
+        except Exception as e:
+            if not openai_retryable(e):
+                raise
+            llm_retry.breaker.record_failure()
+            yield ""
+            continue
+        llm_retry.breaker.record_success()
+        break
+
+    if llm_cache is not None:
+        llm_cache.set(cache_key, answer.strip())
+
+
+def llm_stream(query_text: str):
+    logging.info(f"Performing streaming LLM passthrough query for user search: {query_text}")
+    cache_key = LLMResponseCache.key(model_name, LLM_SYSTEM_PROMPT, query_text)
+    messages = [
+        {"role": "system", "content": LLM_SYSTEM_PROMPT},
+        {"role": "user", "content": query_text},
+    ]
+    return stream_answer(messages, cache_key)
+
+
+def rag_stream(query_text: str, filters: dict, retriever=None) -> tuple:
+    # retrieval runs up front so the caller can show the source docs while the answer streams
+    logging.info(f"Performing streaming RAG query for user search: {query_text}")
+    retriever = retriever or elasticsearch_elser
+    es_hits = retriever(query_text, filters)["source_docs"]
+    prompt = build_rag_prompt(es_hits, query_text)
+    cache_key = LLMResponseCache.key(
+        model_name, prompt, query_text, [hit["report_id"] for hit in es_hits]
     )
-    # send the hits into the LLM as context
-    success = False
-    while not success:
-        response = open_ai_client.chat.completions.create(
-            temperature=0,
-            model=model_name,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": query_text},
-            ],
-        )
-        # check if the response got filtered by content filter
-        if hasattr(response.choices[0], "content_filter_results"):
-            cfr = response.choices[0].content_filter_results
-            if any(item.get("filtered", False) for item in cfr.values()):
-                logging.warn("Failed due to content filtering. Retrying")
-                time.sleep(1)
-            else:
-                success = True
-                print(f"Success {response.to_json}")
-                return {
-                    "llm_response": response.choices[0].message.content.strip(),
-                    "source_docs": es_hits,
-                }
-        else:
-            return {
-                "llm_response": response.choices[0].message.content.strip(),
-                "source_docs": es_hits,
-            }
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": query_text},
+    ]
+    return es_hits, stream_answer(messages, cache_key)
 
 
 def search(query_text: str, search_method: str, filters: dict) -> tuple:
@@ -395,6 +354,14 @@ def search(query_text: str, search_method: str, filters: dict) -> tuple:
             text = "See below for reports."
         return text, response["source_docs"]
 
+    elif search_method == "**Hybrid**":
+        response = elasticsearch_hybrid(query_text, filters)
+        if len(response["source_docs"]) == 0:
+            text = "No results found."
+        else:
+            text = "See below for reports."
+        return text, response["source_docs"]
+
     elif search_method == "**LLM**":
         response = llm(query_text)
         return response["llm_response"], None
@@ -403,6 +370,10 @@ def search(query_text: str, search_method: str, filters: dict) -> tuple:
         response = rag(query_text, filters)
         return response["llm_response"], response["source_docs"]
 
+    elif search_method == "**RAG w/ Hybrid**":
+        response = rag(query_text, filters, retriever=elasticsearch_hybrid)
+        return response["llm_response"], response["source_docs"]
+
 
 def get_classification_level(classification: str) -> int:
     level_map = {
@@ -414,9 +385,95 @@ def get_classification_level(classification: str) -> int:
     return level_map[classification]  
 
 
+def render_reports(json_result: list):
+    report_classifications = [report["classification"] for report in json_result]
+    st.markdown(
+        f"*Highest classification of returned results: {max(report_classifications, key=get_classification_level)}*"
+    )
+    for x in range(len(json_result)):
+        doc = json_result[x]
+        with st.expander(f"**Intelligence Report ID {doc["report_id"]}** - {doc["summary"][:65]}..."):
+            st.markdown(f"**Classification**: {doc["classification"]}")
+            st.markdown(f"**Compartments**: {', '.join(doc["compartments"])}")
+            st.markdown(
+                f"**Report Date**: {datetime.strptime(doc["date"], "%Y-%m-%dT%H:%M:%S.%f").strftime("%A, %B %d, %Y")}"
+            )
+            st.markdown(f"**Summary**: {doc["summary"]}")
+            st.markdown(f"**Country**: {doc["country.name"] if "country.name" in doc else doc["country"]["name"]}")
+            st.markdown(f"**Source of Intel**: {doc["source"]}")
+            if isinstance(doc["details"], list):
+                st.markdown(f"**Details**: {doc["details"][0]}")
+            else:
+                st.markdown(f"**Details**: {doc["details"]}")
+
+    st.write("")
+    st.write("")
+    with st.expander(
+        "Below are the raw documents from ES that informed this answer:"
+    ):
+        st.json(json_result)
+
+
+def show_search_error(e: Exception):
+    # retried calls raise RetryError with the last connection error as its cause
+    connection_error = e if isinstance(e, ESConnectionError) else e.__cause__
+    if isinstance(connection_error, ESConnectionError):
+        # have the background health check reconnect instead of waiting for its next run
+        clients.report_failure()
+        st.error(f"Could not reach Elasticsearch: {connection_error}")
+    else:
+        st.error(f"Search failed: {e}")
+
+
+def answer_query(search_query: str, search_method: str, filters: dict):
+    if stream_responses and search_method in ("**LLM**", "**RAG w/ ELSER**", "**RAG w/ Hybrid**"):
+        st.write("")
+        answer_placeholder = st.empty()
+        st.write("")
+        try:
+            if search_method != "**LLM**":
+                retriever = elasticsearch_hybrid if search_method == "**RAG w/ Hybrid**" else elasticsearch_elser
+                with st.spinner("Searching..."):
+                    es_hits, answer_stream = rag_stream(search_query, filters, retriever)
+                if es_hits:
+                    with span("render"):
+                        render_reports(es_hits)
+            else:
+                answer_stream = llm_stream(search_query)
+            with span("llm_stream"):
+                for answer in answer_stream:
+                    answer_placeholder.markdown(f"##### **{answer.strip()}**" if answer.strip() else "")
+        except (ESConnectionError, RetryError, CircuitOpenError, UnsupportedQuery) as e:
+            show_search_error(e)
+        return
+
+    with st.spinner("Searching..."):
+        try:
+            with span("search"):
+                text_result, json_result = search(search_query, search_method, filters)
+        except (ESConnectionError, RetryError, CircuitOpenError, UnsupportedQuery) as e:
+            show_search_error(e)
+            return
+    st.write("")
+    st.markdown(f"##### **{text_result}**")
+    st.write("")
+    if json_result:
+        with span("render"):
+            render_reports(json_result)
+
+
+def render_timings(query_trace: Trace):
+    rows = query_trace.rows()
+    if rows:
+        with st.expander("Timings"):
+            st.table(rows)
+
+
 def main():
     # top header
     st.header("GenAI-Powered Intelligence Analysis", divider="grey")
+    if clients.healthy is False and local_index is None:
+        st.warning("Elasticsearch is currently unreachable. Reconnecting in the background...")
 
     # sidebar
     st.sidebar.image(".streamlit/logo-elastic-horizontal-color.png", width=100)
@@ -435,7 +492,7 @@ def main():
         label="Countries of Interest",
         help="Defaults to All",
         placeholder="Select one or more",
-        options=[country["name"] for country in countries]
+        options=reference_data.country_names
     )
     source_selection = st.sidebar.multiselect(
         label="Sources",
@@ -449,30 +506,29 @@ def main():
         placeholder="Select one or more",
         options = compartments
     )
-    if not config["ELASTIC_CLOUD_ID"].endswith("mExMzNiYWJmMzE0Lmti"): # demo cluster is protected
+    if llm_cache is not None:
+        stats = llm_cache.stats()
+        st.sidebar.caption(
+            f"LLM cache: {stats['hit_rate']:.0%} hit rate ({stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries)"
+        )
+    for policy in (llm_retry, es_retry):
+        stats = policy.stats()
+        if stats["retries"] or stats["give_ups"]:
+            st.sidebar.caption(
+                f"{policy.name}: {stats['retries']} retries, {stats['give_ups']} give-ups, circuit {stats['circuit']}"
+            )
+    show_timings = st.sidebar.checkbox("Show timings", help="Time spent in each stage of the query")
+    # demo cluster is protected; the local index isn't rebuilt by Data Setup
+    if local_index is None and not config["ELASTIC_CLOUD_ID"].endswith("mExMzNiYWJmMzE0Lmti"):
         if st.sidebar.checkbox("Data Setup"):
-            if st.sidebar.button(label="Generate and index intel reports", type="primary"):
-                # create reports
-                logging.info(f"Creating {config['NUM_REPORTS']} fake intel reports")
-                intelligence_reports = []
-                for i in range(config["NUM_REPORTS"]):
-                    report = create_report(i)
-                    intelligence_reports.append(report)
-
-                # setup Elasticsearch
-                setup_es(es, reset=True)
-
-                # ingest reports into Elasticsearch
-                ok, err = bulk_ingest(es, config["ELASTIC_INDEX"], intelligence_reports + precanned_events)
-                if not ok:
-                    st.sidebar.write(err)
-
-                else:
-                    # reset index settings back to normal settings now that ingest is complete
-                    # settings = {"index": {"number_of_replicas": "1", "refresh_interval": "1s"}}
-                    # es.indices.put_settings(index=config["ELASTIC_INDEX"], settings=settings)
-
-                    st.sidebar.markdown("**Done!**")
+            if st.sidebar.button(
+                label="Generate and index intel reports", type="primary", disabled=reindexer.running
+            ):
+                start_rebuild()
+            # searches keep using the current index while the new one is built; poll for progress
+            running = reindexer.running
+            with st.sidebar:
+                st.fragment(run_every=1 if running else None)(rebuild_status)(running)
 
     # search method options
     search_method = st.radio(
@@ -480,8 +536,10 @@ def main():
         [
             "**Elasticsearch Basic**",
             "**ELSER**",
+            "**Hybrid**",
             "**LLM**",
             "**RAG w/ ELSER**",
+            "**RAG w/ Hybrid**",
         ],
         horizontal=True,
     )
@@ -493,45 +551,18 @@ def main():
         value="",
     )
     if search_query:
-        with st.spinner("Searching..."):
-            filters = {
-                "date_range": date_range_selection,
-                "classifications": classification_selection,
-                "sources": source_selection,
-                "countries": country_selection,
-                "compartments": compartment_selection
-            }
-            text_result, json_result = search(search_query, search_method, filters)
-        st.write("")
-        st.markdown(f"##### **{text_result}**")
-        st.write("")
-        if json_result:
-            report_classifications = [report["classification"] for report in json_result]
-            st.markdown(
-                f"*Highest classification of returned results: {max(report_classifications, key=get_classification_level)}*"
-            )
-            for x in range(len(json_result)):
-                doc = json_result[x]
-                with st.expander(f"**Intelligence Report ID {doc["report_id"]}** - {doc["summary"][:65]}..."):
-                    st.markdown(f"**Classification**: {doc["classification"]}")
-                    st.markdown(f"**Compartments**: {', '.join(doc["compartments"])}")
-                    st.markdown(
-                        f"**Report Date**: {datetime.strptime(doc["date"], "%Y-%m-%dT%H:%M:%S.%f").strftime("%A, %B %d, %Y")}"
-                    )
-                    st.markdown(f"**Summary**: {doc["summary"]}")
-                    st.markdown(f"**Country**: {doc["country.name"] if "country.name" in doc else doc["country"]["name"]}")
-                    st.markdown(f"**Source of Intel**: {doc["source"]}")
-                    if isinstance(doc["details"], list):
-                        st.markdown(f"**Details**: {doc["details"][0]}")
-                    else:
-                        st.markdown(f"**Details**: {doc["details"]}")
-
-            st.write("")
-            st.write("")
-            with st.expander(
-                "Below are the raw documents from ES that informed this answer:"
-            ):
-                st.json(json_result)
+        filters = {
+            "date_range": date_range_selection,
+            "classifications": classification_selection,
+            "sources": source_selection,
+            "countries": country_selection,
+            "compartments": compartment_selection
+        }
+        # every stage's time goes to the metrics histograms; the trace is just for the panel
+        with trace() as query_trace:
+            answer_query(search_query, search_method, filters)
+        if show_timings:
+            render_timings(query_trace)
 
 
 if __name__ == "__main__":
@@ -545,33 +576,68 @@ if __name__ == "__main__":
 
     config = read_config(args.config_path)
 
-    es = connect_es(config)
+    # clients are shared across reruns and sessions; health checks run in the background
+    # (with the local search backend there is no ES client to check)
+    clients = get_clients(config)
+    es = clients.es
+    open_ai_client = clients.open_ai_client
+    model_name = clients.model_name
 
-    if "LOCAL_LLM" in config and ( config["LOCAL_LLM"] == "True" or config["LOCAL_LLM"] == "true" ):
-        logging.info("Local LLM selected via config. Using locally hosted LLM")
-        open_ai_client = connect_self_hosted_llm(
-            config["LOCAL_LLM_URL"], config["LOCAL_LLM_API_KEY"]
-        )
-        model_name = config["LOCAL_LLM_MODEL"]
-    else:
-        logging.info("Using Azure OpenAI LLM")
-        open_ai_client = connect_open_ai(
-            config["AZURE_OPENAI_API_KEY"],
-            config["AZURE_API_VERSION"],
-            config["AZURE_ENDPOINT"],
-            config["AZURE_DEPLOYMENT"],
-        )
-        model_name = config["AZURE_MODEL"]
-
-    start_date = datetime(2023, 5, 1)
-    end_date = datetime(2024, 4, 3)
-
-    countries = read_file("data/countries.json")
-    groups = read_file("data/groups.json")
-    sources = read_file("data/sources.json")
-    details_options = read_file("data/details.json")
-    classifications = read_file("data/classifications.json")
-    compartments = read_file("data/compartments.json")
-    precanned_events = read_file("data/precanned-events.json")
+    llm_retry, es_retry = get_retry_policies(
+        config.get("RETRY_MAX_ATTEMPTS", 4), config.get("RETRY_DEADLINE_SECONDS", 30)
+    )
+
+    reindexer = get_reindexer()
+
+    query_cache = get_query_cache(config.get("QUERY_CACHE_SIZE", 1024), config.get("QUERY_CACHE_TTL", 300))
+
+    # precomputed ELSER query expansions, so repeat queries skip inference on the ML nodes
+    expansion_cache = None
+    if config.get("ELSER_EXPANSION_CACHE", "false").lower() == "true":
+        expansion_cache = get_expansion_cache(config.get("ELSER_EXPANSION_CACHE_SIZE", 10_000))
+
+    # LLM answers persisted on local disk, keyed on model, prompt and retrieved reports
+    llm_cache = None
+    if "LLM_CACHE_PATH" in config:
+        llm_cache = get_llm_cache(config["LLM_CACHE_PATH"], config.get("LLM_CACHE_MAX_ENTRIES", 10_000))
+
+    # lexical search from an in-memory BM25 index instead of the cluster (no ELSER)
+    local_index = None
+    if use_local_search(config):
+        local_index = get_local_index(config.get("LOCAL_INDEX_REPORTS", 10_000))
+
+    # RAG through AsyncElasticsearch/AsyncOpenAI on a shared event loop
+    async_engine = None
+    if config.get("ASYNC_SEARCH", "false").lower() == "true" and local_index is None:
+        async_engine = get_async_engine(config, expansion_cache)
+
+    searcher = SearchService(
+        es,
+        config["ELASTIC_INDEX"],
+        open_ai_client,
+        model_name,
+        es_retry=es_retry,
+        llm_retry=llm_retry,
+        query_cache=query_cache,
+        expansions=expansion_cache,
+        llm_cache=llm_cache,
+        context_max_tokens=config.get("RAG_CONTEXT_MAX_TOKENS", 1500),
+        today=today,
+        backend=local_index,
+    )
+
+    # Prometheus-style scrape endpoint for stage latencies, token usage, cache hits and retries
+    if "METRICS_PORT" in config:
+        get_metrics_server(config["METRICS_PORT"])
+        register_metrics()
+
+    # render LLM and RAG answers token by token instead of after the full completion
+    stream_responses = config.get("STREAM_RESPONSES", "false").lower() == "true"
+    # cleared the first time the endpoint rejects stream_options
+    stream_usage = True
+
+    sources = reference_data.sources
+    classifications = reference_data.classifications
+    compartments = reference_data.compartments
 
     main()
@@ -1,12 +1,14 @@
 import argparse
-import json
 import logging
-import random
+import os
 import tomllib
-import uuid
-from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import streaming_bulk, BulkIndexError
+from datetime import datetime
+
+from intel_analysis.bulk import IngestOptions
+from intel_analysis.clients import connect_es, es_credentials
+from intel_analysis.embeddings import EmbeddingCache
+from intel_analysis.ingest import bulk_ingest, report_stream, setup_es
+from intel_analysis.refdata import load_reference_data
 
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
@@ -24,173 +26,56 @@ def read_config(config_path):
     return config_data
 
 
-def read_file(file_name):
-    with open(file_name, "r") as file:
-        data = json.load(file)
-    return data
-
-
-def setup_es(cloud_id, user, pw, index, reset):
-    es = Elasticsearch(cloud_id=cloud_id, basic_auth=(user, pw))
-    if reset and es.indices.exists(index=index):
-        logging.info("Deleting existing index")
-        es.indices.delete(index=index)
-
-    if not es.indices.exists(index=index):
-        logging.info("Creating index")
-        mapping = {
-            "_source": {
-                "excludes": [
-                    "details_embeddings"
-                ]
-            },
-            "properties": {
-                "classification": {"type": "keyword"},
-                "compartments": {"type": "keyword"},
-                "date": {"type": "date"},
-                "details": {"type": "text"},
-                "details_embeddings": {"type": "sparse_vector"},
-                "report_id": {"type": "keyword"},
-                "source": {"type": "keyword"},
-                "group": {"type": "keyword"},
-                "summary": {"type": "text", "fields": {"suggest": {"type": "search_as_you_type"}}},
-                "country.name": {"type": "keyword"},
-                "country.coordinates": {"type": "geo_point"},
-                "country.code": {"type": "keyword"},
-            }
-        }
-        settings = {
-            "index": {
-                "number_of_shards": "2",
-                "number_of_replicas": "0",
-                "refresh_interval": "-1",
-                "default_pipeline": "intel-workshop"
-            }
-        }
-        es.indices.create(index=index, mappings=mapping, settings=settings)
-
-    logging.info("Creating/updating ingest pipeline")
-    processors = [
-        {
-            "inference": {
-                "model_id": ".elser_model_2",
-                "input_output": [
-                    {
-                        "input_field": "details",
-                        "output_field": "details_embeddings"
-                    }
-                ]
-            }
-        }
-    ]
-    es.ingest.put_pipeline(id="intel-workshop", processors=processors)
-    return es
-
-def generate_selector():
-    return str(uuid.uuid4())
-
-def bulk_ingest(es, index, docs):
-    try:
-        logging.info("Sending docs to ES")
-        for ok, action in streaming_bulk(
-            client=es, index=index, actions=yield_doc(docs), chunk_size=10
-        ):
-            if not ok:
-                logging.error(f"{ok} {action}")
-    except BulkIndexError as e:
-        print(f"{len(e.errors)} document(s) failed to index.")
-        for error in e.errors:
-            print(error)
-
-
-def yield_doc(docs):
-    for doc in docs:
-        # print(json.dumps(doc))
-        yield json.dumps(doc)
-
-
-def random_date():
-    current_datetime = datetime.now()
-
-    random_timedelta = timedelta(
-        days=random.randint(0, 365),
-        hours=random.randint(0, 23),
-        minutes=random.randint(0, 59),
-        seconds=random.randint(0, 59),
-        microseconds=random.randint(0, 999999)
-    )
-
-    random_datetime = current_datetime - random_timedelta
-    return random_datetime.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
-
-
-def generate_summary(details):
-    sentences = details.split(". ")
-    if len(sentences) > 1:
-        summary = sentences[0] + "."
-    else:
-        summary = details
-    return summary
-
-
-def create_report():
-    country = random.choice(countries)
-    group = random.choice(groups)
-    details = random.choice(details_options).format(country["name"], group, generate_selector())
-    summary = generate_summary(details)
-    report = {
-        "report_id": f"INT-2024-{i+1:03d}",
-        "date": random_date(),
-        "source": random.choice(sources),
-        "group": group,
-        "country.name": country["name"],
-        "country.coordinates": country["coordinates"],
-        "country.code": country["code"],
-        "summary": summary,
-        "details": details,
-        "classification": random.choice(classifications),
-        "compartments": random.sample(compartments, random.randint(1, 4))
-    }
-    return report
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Create a bunch of fake intel reports and index them in Elasticsearch"
     )
     parser.add_argument("-c", "--config", action="store", dest="config_path", default="config.toml")
     parser.add_argument("-r", "--reset", action="store_true", default=False)
+    parser.add_argument(
+        "-w", "--workers", action="store", type=int, default=os.cpu_count(),
+        help="number of processes used to generate reports"
+    )
+    parser.add_argument(
+        "-s", "--seed", action="store", type=int, default=None,
+        help="seed for reproducible reports (dates are then anchored to the start of today)"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true", default=False,
+        help="draw reports in NumPy column batches (faster; seeded output differs from the default path)"
+    )
     args = parser.parse_args()
 
     config_data = read_config(args.config_path)
 
-    start_date = datetime(2023, 5, 1)
-    end_date = datetime(2024, 4, 3)
+    reference_data = load_reference_data("data")
 
-    countries = read_file("data/countries.json")
-    groups = read_file("data/groups.json")
-    sources = read_file("data/sources.json")
-    details_options = read_file("data/details.json")
-    classifications = read_file("data/classifications.json")
-    compartments = read_file("data/compartments.json")
-    precanned_events = read_file("data/precanned-events.json")
+    now = None
+    if args.seed is not None:
+        now = datetime.combine(datetime.today(), datetime.min.time())
 
-    logging.info(f"Creating {config_data['NUM_REPORTS']} fake intel reports")
-    intelligence_reports = []
-    for i in range(config_data["ELASTIC_NUM_REPORTS"]):
-        report = create_report()
-        intelligence_reports.append(report)
+    es = connect_es(config_data, es_credentials(config_data)[0])
+    setup_es(es, config_data["ELASTIC_INDEX"], args.reset)
 
-    es = setup_es(
-        config_data["ELASTIC_CLOUD_ID"],
-        config_data["ELASTIC_USER"],
-        config_data["ELASTIC_PASSWORD"],
-        config_data["ELASTIC_INDEX"],
-        args.reset,
-    )
+    options = IngestOptions.from_config(config_data)
 
-    bulk_ingest(es, config_data["ELASTIC_INDEX"], intelligence_reports + precanned_events)
+    # with an embedding cache, docs arrive with their ELSER tokens and skip the inference pipeline
+    embeddings = None
+    if "EMBEDDING_CACHE_PATH" in config_data:
+        embeddings = EmbeddingCache(config_data["EMBEDDING_CACHE_PATH"])
+        options.pipeline = "_none"
 
-    # reset index settings back to normal settings now that ingest is complete
-    settings = {"index": {"number_of_replicas": "1", "refresh_interval": "1s"}}
-    es.indices.put_settings(index=config_data["ELASTIC_INDEX"], settings=settings)
+    docs = report_stream(
+        reference_data, config_data["NUM_REPORTS"], workers=args.workers, seed=args.seed, now=now,
+        es=es, embeddings=embeddings,
+        template_embeddings=config_data.get("TEMPLATE_EMBEDDINGS", "false").lower() == "true",
+        columnar=args.columnar,
+    )
+    indexed, errors = bulk_ingest(es, config_data["ELASTIC_INDEX"], docs, options)
+    if embeddings is not None:
+        stats = embeddings.stats()
+        logging.info(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    if errors:
+        print(f"{len(errors)} document(s) failed to index.")
+        for error in errors:
+            print(error)
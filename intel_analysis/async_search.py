@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import threading
+
+from intel_analysis.clients import connect_async_es, connect_async_llm
+from intel_analysis.content_filter import content_filtered
+from intel_analysis.expansion import ExpansionCache, sparse_vector_query_async
+from intel_analysis.llm_cache import LLMResponseCache
+from intel_analysis.metrics import record_usage
+from intel_analysis.queries import (
+    ELSER_INFERENCE_ID,
+    basic_hits,
+    basic_query,
+    elser_hits,
+    elser_query,
+)
+from intel_analysis.retry import RetryPolicy, es_retryable, openai_retryable
+
+
+def merge_hits(*hit_lists) -> list:
+    # interleave result lists (best hits of each first), dropping duplicate reports
+    merged, seen = [], set()
+    for rank in range(max((len(hits) for hits in hit_lists), default=0)):
+        for hits in hit_lists:
+            if rank < len(hits) and hits[rank]["report_id"] not in seen:
+                seen.add(hits[rank]["report_id"])
+                merged.append(hits[rank])
+    return merged
+
+
+class AsyncSearchEngine:
+    """Lexical + ELSER retrieval and RAG on AsyncElasticsearch / AsyncOpenAI.
+
+    The clients live on one event loop running in a background thread, shared
+    by every Streamlit session; `run()` submits a coroutine from any thread.
+    Each stage (retrieval, LLM) has its own timeout.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        retrieval_timeout: float = 10,
+        llm_timeout: float = 60,
+        expansions: ExpansionCache | None = None,
+        es_retry: RetryPolicy | None = None,
+        llm_retry: RetryPolicy | None = None,
+    ):
+        self.index = config["ELASTIC_INDEX"]
+        self.retrieval_timeout = retrieval_timeout
+        self.llm_timeout = llm_timeout
+        self.expansions = expansions
+        self.es_retry = es_retry or RetryPolicy("Elasticsearch (async)")
+        self.llm_retry = llm_retry or RetryPolicy("LLM (async)")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-search", daemon=True)
+        self._thread.start()
+        self.es, (self.llm, self.model_name) = self.run(self._connect(config))
+
+    async def _connect(self, config):
+        # the clients' connection pools are bound to the loop they're created on
+        return connect_async_es(config), connect_async_llm(config)
+
+    def run(self, coro, timeout: float | None = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _search(self, build_query):
+        # the query is built inside the timeout and each retry, so ELSER expansion is covered too
+        async def search():
+            return await self.es.search(index=self.index, body=await build_query(), request_cache=True)
+
+        return await asyncio.wait_for(
+            self.es_retry.call_async(search, retry_on=es_retryable),
+            self.retrieval_timeout,
+        )
+
+    async def basic(self, query_text: str, search_filters: list) -> list:
+        async def build_query():
+            return basic_query(query_text, search_filters)
+
+        res = await self._search(build_query)
+        return basic_hits(res)
+
+    async def elser(self, query_text: str, search_filters: list) -> list:
+        async def build_query():
+            sparse_vector = await sparse_vector_query_async(
+                "details_embeddings", ELSER_INFERENCE_ID, query_text, es=self.es, expansions=self.expansions
+            )
+            return elser_query(sparse_vector, search_filters)
+
+        res = await self._search(build_query)
+        return elser_hits(res)
+
+    async def retrieve(self, query_text: str, search_filters: list) -> dict:
+        """Run lexical and ELSER retrieval concurrently.
+
+        A method that fails or times out is logged and left out, so one slow
+        retriever doesn't sink the other; if both fail the first error is raised.
+        """
+        methods = {"elser": self.elser, "basic": self.basic}
+        results = await asyncio.gather(
+            *(search(query_text, search_filters) for search in methods.values()),
+            return_exceptions=True,
+        )
+        hits = {}
+        for name, result in zip(methods, results):
+            if isinstance(result, BaseException):
+                logging.warning(f"Async {name} retrieval failed: {result!r}")
+                continue
+            hits[name] = result
+        if not hits:
+            raise results[0]
+        return hits
+
+    async def complete(self, messages: list):
+        response = await asyncio.wait_for(
+            self.llm_retry.call_async(
+                lambda: self.llm.chat.completions.create(
+                    temperature=0, model=self.model_name, messages=messages
+                ),
+                retry_on=openai_retryable,
+                retry_if_result=content_filtered,
+            ),
+            self.llm_timeout,
+        )
+        record_usage(response)
+        return response
+
+    async def rag(self, query_text: str, search_filters: list, build_prompt, llm_cache: LLMResponseCache | None = None) -> dict:
+        logging.info(f"Performing async RAG query for user search: {query_text}")
+        hits = await self.retrieve(query_text, search_filters)
+        # the LLM call starts as soon as both retrievers are back
+        es_hits = merge_hits(hits.get("elser", []), hits.get("basic", []))
+        prompt = build_prompt(es_hits, query_text)
+
+        cache_key = LLMResponseCache.key(
+            self.model_name, prompt, query_text, [hit["report_id"] for hit in es_hits]
+        )
+        # the cache is SQLite on local disk; keep its reads and writes off the shared loop
+        if llm_cache is not None:
+            cached = await asyncio.to_thread(llm_cache.get, cache_key)
+            if cached is not None:
+                return {"llm_response": cached, "source_docs": es_hits}
+
+        response = await self.complete(
+            [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": query_text},
+            ]
+        )
+        answer = response.choices[0].message.content.strip()
+        if llm_cache is not None:
+            await asyncio.to_thread(llm_cache.set, cache_key, answer)
+        return {"llm_response": answer, "source_docs": es_hits}
+
+    async def _close(self):
+        await self.es.close()
+        await self.llm.close()
+
+    def close(self):
+        self.run(self._close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
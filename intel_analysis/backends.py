@@ -0,0 +1,37 @@
+from intel_analysis.retry import RetryPolicy, es_retryable
+
+
+class UnsupportedQuery(ValueError):
+    """A search the backend can't run, e.g. ELSER against the local index."""
+
+
+class SearchBackend:
+    """Where SearchService sends the search bodies built in queries.py.
+
+    `search()` returns an Elasticsearch-shaped response (hits.hits with
+    _source, _score and, when asked for, highlight), so the hit parsing and
+    rendering are the same whichever backend answered.
+    """
+
+    name = "search"
+    # ELSER (sparse_vector) queries, and hybrid queries built on them
+    supports_sparse_vector = True
+
+    def search(self, body: dict) -> dict:
+        raise NotImplementedError
+
+
+class ElasticsearchBackend(SearchBackend):
+    name = "elasticsearch"
+
+    def __init__(self, es, index: str, retry: RetryPolicy | None = None):
+        self.es = es
+        self.index = index
+        self.retry = retry or RetryPolicy("Elasticsearch")
+
+    def search(self, body: dict) -> dict:
+        # with rounded date filters, repeat searches can be answered from the shard request cache
+        return self.retry.call(
+            lambda: self.es.search(index=self.index, body=body, request_cache=True),
+            retry_on=es_retryable,
+        )
@@ -0,0 +1,201 @@
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from elasticsearch import ApiError
+
+from intel_analysis.serialization import dumps
+
+
+@dataclass
+class IngestOptions:
+    threads: int = 4
+    chunk_size: int = 200
+    max_chunk_bytes: int = 10 * 1024 * 1024
+    max_in_flight: int = 8
+    # bounds and target for the adaptive chunk sizing
+    min_chunk_size: int = 10
+    max_chunk_size: int = 2_000
+    target_latency_ms: float = 5_000
+    adaptive: bool = True
+    max_retries: int = 8
+    initial_backoff: float = 1.0
+    max_backoff: float = 30.0
+    # ingest pipeline for the bulk requests; "_none" skips the index's default
+    # pipeline, for docs that already carry their ELSER tokens
+    pipeline: str | None = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> "IngestOptions":
+        keys = {
+            "INGEST_THREADS": "threads",
+            "INGEST_CHUNK_SIZE": "chunk_size",
+            "INGEST_MAX_CHUNK_BYTES": "max_chunk_bytes",
+            "INGEST_MAX_IN_FLIGHT": "max_in_flight",
+            "INGEST_MIN_CHUNK_SIZE": "min_chunk_size",
+            "INGEST_MAX_CHUNK_SIZE": "max_chunk_size",
+            "INGEST_TARGET_LATENCY_MS": "target_latency_ms",
+            "INGEST_ADAPTIVE": "adaptive",
+            "INGEST_MAX_RETRIES": "max_retries",
+        }
+        options = {field: config[key] for key, field in keys.items() if key in config}
+        if isinstance(options.get("adaptive"), str):
+            options["adaptive"] = options["adaptive"].lower() == "true"
+        return cls(**options)
+
+
+class ChunkSizer:
+    """AIMD chunk sizing: grow while bulk requests come back under the
+    latency target, halve on 429 rejections or when latency overshoots."""
+
+    def __init__(self, options: IngestOptions):
+        self.options = options
+        self.size = max(options.min_chunk_size, min(options.chunk_size, options.max_chunk_size))
+
+    def observe(self, latency_ms: float, rejected: bool):
+        if not self.options.adaptive:
+            return
+        old = self.size
+        if rejected or latency_ms > self.options.target_latency_ms * 1.5:
+            self.size = max(self.options.min_chunk_size, self.size // 2)
+        elif latency_ms < self.options.target_latency_ms:
+            step = max(1, self.options.chunk_size // 10)
+            self.size = min(self.options.max_chunk_size, self.size + step)
+        if self.size != old:
+            logging.info(f"Bulk chunk size {old} -> {self.size} (latency {latency_ms:.0f}ms, rejected={rejected})")
+
+
+class _Chunk:
+    def __init__(self, docs, attempt=0, not_before=0.0):
+        self.docs = docs
+        self.attempt = attempt
+        self.not_before = not_before
+
+
+def _serialize(doc) -> bytes:
+    if isinstance(doc, bytes):
+        return doc
+    if isinstance(doc, str):
+        return doc.encode("utf-8")
+    return dumps(doc)
+
+
+def _bulk_body(action: bytes, docs) -> bytes:
+    # docs are already serialized; a single join builds the NDJSON body in one allocation
+    return b"".join(part for doc in docs for part in (action, b"\n", doc, b"\n"))
+
+
+def _send_chunk(es, action, chunk, pipeline=None):
+    body = _bulk_body(action, chunk.docs)
+    start = time.perf_counter()
+    try:
+        res = es.bulk(operations=body, pipeline=pipeline)
+    except ApiError as e:
+        if e.meta.status == 429:
+            return (time.perf_counter() - start) * 1000, None
+        raise
+    return (time.perf_counter() - start) * 1000, res
+
+
+def parallel_ingest(es, index, docs, options: IngestOptions | None = None, on_progress=None):
+    """Bulk index `docs` with several concurrent requests.
+
+    Docs rejected with 429 (the ELSER inference pipeline is usually what
+    pushes back) are retried with jittered exponential backoff and shrink the
+    chunk size. `on_progress(indexed_count)` is called on the calling thread.
+    Returns (indexed_count, errors).
+    """
+    options = options or IngestOptions()
+    sizer = ChunkSizer(options)
+    indexed = 0
+    errors = []
+    retries = deque()
+    pending = set()
+    docs = iter(docs)
+    exhausted = False
+
+    def next_chunk():
+        nonlocal exhausted
+        now = time.monotonic()
+        if retries and retries[0].not_before <= now:
+            return retries.popleft()
+        if exhausted:
+            return None
+        batch, size = [], 0
+        for doc in docs:
+            doc = _serialize(doc)
+            batch.append(doc)
+            size += len(doc)
+            if len(batch) >= sizer.size or size >= options.max_chunk_bytes:
+                break
+        else:
+            exhausted = True
+        return _Chunk(batch) if batch else None
+
+    def retry_later(chunk, docs_to_retry):
+        attempt = chunk.attempt + 1
+        if attempt > options.max_retries:
+            errors.extend({"index": {"status": 429, "error": "rejected after retries", "doc": d}} for d in docs_to_retry)
+            return
+        delay = min(options.max_backoff, options.initial_backoff * 2 ** chunk.attempt)
+        delay = random.uniform(delay / 2, delay)
+        retries.append(_Chunk(docs_to_retry, attempt, time.monotonic() + delay))
+
+    def handle(chunk, result):
+        nonlocal indexed
+        latency_ms, res = result
+        if res is None:
+            # the whole request was rejected
+            sizer.observe(latency_ms, rejected=True)
+            retry_later(chunk, chunk.docs)
+            return
+        rejected = []
+        for doc, item in zip(chunk.docs, res["items"]):
+            status = item["index"]["status"]
+            if status == 429:
+                rejected.append(doc)
+            elif status >= 300:
+                errors.append(item)
+            else:
+                indexed += 1
+        sizer.observe(latency_ms, rejected=bool(rejected))
+        if rejected:
+            retry_later(chunk, rejected)
+        if on_progress:
+            on_progress(indexed)
+
+    def collect(block):
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            chunk = futures[future]
+            del futures[future]
+            handle(chunk, future.result())
+
+    action = dumps({"index": {"_index": index}})
+    futures = {}
+    logging.info(f"Sending docs to ES with {options.threads} threads")
+    with ThreadPoolExecutor(max_workers=options.threads, thread_name_prefix="bulk") as executor:
+        while True:
+            if len(pending) >= options.max_in_flight:
+                collect(block=True)
+                continue
+            chunk = next_chunk()
+            if chunk is None:
+                if pending:
+                    collect(block=True)
+                    continue
+                if retries:
+                    time.sleep(max(0.0, retries[0].not_before - time.monotonic()))
+                    continue
+                break
+            future = executor.submit(_send_chunk, es, action, chunk, options.pipeline)
+            futures[future] = chunk
+            pending.add(future)
+            if pending:
+                collect(block=False)
+
+    return indexed, errors
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalize_query(query_text: str) -> str:
+    # only whitespace is normalized: case matters to query_string operators (AND, OR, NOT)
+    return " ".join(query_text.split())
+
+
+class QueryCache(TTLCache):
+    """Search result cache keyed on (method, normalized query, filters, index generation).
+
+    `invalidate()` bumps the generation whenever the index is rewritten, so
+    results from before a reindex are never served again.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        super().__init__(maxsize, ttl)
+        self.generation = 0
+
+    def key(self, method: str, query_text: str, filters: list) -> str:
+        return json.dumps([method, normalize_query(query_text), filters, self.generation], sort_keys=True)
+
+    def get_or_search(self, method: str, query_text: str, filters: list, search_fn):
+        # cached results are shared between sessions; callers must treat them as read-only
+        key = self.key(method, query_text, filters)
+        result = self.get(key)
+        if result is None:
+            result = search_fn()
+            self.set(key, result)
+        return result
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
@@ -0,0 +1,169 @@
+import logging
+import threading
+
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
+
+from intel_analysis.serialization import es_serializers
+
+
+ES_CONNECTIONS_PER_NODE = 10
+HEALTH_CHECK_INTERVAL = 30
+
+
+def es_credentials(config: dict) -> list:
+    credentials = []
+    if "ELASTIC_API_KEY" in config:
+        credentials.append({"api_key": config["ELASTIC_API_KEY"]})
+    if "ELASTIC_USER" in config and "ELASTIC_PASSWORD" in config:
+        credentials.append({"basic_auth": (config["ELASTIC_USER"], config["ELASTIC_PASSWORD"])})
+    if not credentials:
+        raise Exception("No Elasticsearch credentials provided in config.")
+    return credentials
+
+
+def connect_es(config: dict, credentials: dict) -> Elasticsearch:
+    return Elasticsearch(
+        cloud_id=config["ELASTIC_CLOUD_ID"],
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        serializers=es_serializers(),
+        **credentials,
+    )
+
+
+def connect_async_es(config: dict) -> AsyncElasticsearch:
+    return AsyncElasticsearch(
+        cloud_id=config["ELASTIC_CLOUD_ID"],
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        serializers=es_serializers(),
+        **es_credentials(config)[0],
+    )
+
+
+def connect_open_ai(api_key: str, api_version: str, endpoint: str, deployment: str) -> AzureOpenAI:
+    open_ai_client = AzureOpenAI(
+        api_key=api_key,
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        azure_deployment=deployment,
+    )
+    return open_ai_client
+
+
+def connect_self_hosted_llm(base_url: str, api_key: str) -> OpenAI:
+    open_ai_client = OpenAI(base_url=base_url, api_key=api_key)
+    return open_ai_client
+
+
+def use_local_llm(config: dict) -> bool:
+    return "LOCAL_LLM" in config and config["LOCAL_LLM"].lower() == "true"
+
+
+def use_local_search(config: dict) -> bool:
+    return config.get("SEARCH_BACKEND", "elasticsearch") == "local"
+
+
+def connect_llm(config: dict) -> tuple:
+    if use_local_llm(config):
+        logging.info("Local LLM selected via config. Using locally hosted LLM")
+        client = connect_self_hosted_llm(config["LOCAL_LLM_URL"], config["LOCAL_LLM_API_KEY"])
+        return client, config["LOCAL_LLM_MODEL"]
+
+    logging.info("Using Azure OpenAI LLM")
+    client = connect_open_ai(
+        config["AZURE_OPENAI_API_KEY"],
+        config["AZURE_API_VERSION"],
+        config["AZURE_ENDPOINT"],
+        config["AZURE_DEPLOYMENT"],
+    )
+    return client, config["AZURE_MODEL"]
+
+
+def connect_async_llm(config: dict) -> tuple:
+    if use_local_llm(config):
+        client = AsyncOpenAI(base_url=config["LOCAL_LLM_URL"], api_key=config["LOCAL_LLM_API_KEY"])
+        return client, config["LOCAL_LLM_MODEL"]
+
+    client = AsyncAzureOpenAI(
+        api_key=config["AZURE_OPENAI_API_KEY"],
+        api_version=config["AZURE_API_VERSION"],
+        azure_endpoint=config["AZURE_ENDPOINT"],
+        azure_deployment=config["AZURE_DEPLOYMENT"],
+    )
+    return client, config["AZURE_MODEL"]
+
+
+class ClientRegistry:
+    """Process-wide Elasticsearch and LLM clients.
+
+    Clients are built once and shared by every session. Connectivity is
+    checked on a background thread instead of on each request; when a check
+    fails (or a caller reports a failure) the ES client is rebuilt, falling
+    back through the configured credentials. With the local search backend
+    there is no ES client (`es` is None) and no health checks.
+    """
+
+    def __init__(self, config: dict, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.config = config
+        self.health_check_interval = health_check_interval
+        self.healthy = None
+        self._credential_index = 0
+        self._lock = threading.Lock()
+        self._check_now = threading.Event()
+        self._closed = threading.Event()
+        self.open_ai_client, self.model_name = connect_llm(config)
+        self._es = None
+        if use_local_search(config):
+            return
+        self._credentials = es_credentials(config)
+        self._es = connect_es(config, self._credentials[0])
+        self._health_thread = threading.Thread(target=self._health_loop, name="client-health", daemon=True)
+        self._health_thread.start()
+
+    @property
+    def es(self) -> Elasticsearch | None:
+        return self._es
+
+    def report_failure(self):
+        # ask the health thread to re-check (and reconnect) right away
+        self._check_now.set()
+
+    def close(self):
+        self._closed.set()
+        self._check_now.set()
+        if self._es is not None:
+            self._es.close()
+        self.open_ai_client.close()
+
+    def _health_loop(self):
+        while not self._closed.is_set():
+            self._check()
+            self._check_now.wait(self.health_check_interval)
+            self._check_now.clear()
+
+    def _check(self):
+        try:
+            self._es.info()
+            self.healthy = True
+            return
+        except Exception as e:
+            logging.warning(f"Elasticsearch health check failed: {e}")
+
+        # try each set of credentials, starting with the one that last worked
+        for offset in range(len(self._credentials)):
+            index = (self._credential_index + offset) % len(self._credentials)
+            client = connect_es(self.config, self._credentials[index])
+            try:
+                client.info()
+            except Exception:
+                client.close()
+                continue
+            # the old client is left for in-flight requests to finish on
+            with self._lock:
+                self._es = client
+                self._credential_index = index
+            self.healthy = True
+            logging.info("Reconnected to Elasticsearch")
+            return
+        self.healthy = False
+        logging.error("Failed to connect to Elasticsearch with provided credentials.")
@@ -0,0 +1,18 @@
+import logging
+
+
+class ContentFilteredError(Exception):
+    pass
+
+
+def is_filtered(content_filter_results) -> bool:
+    return any(item.get("filtered", False) for item in content_filter_results.values())
+
+
+def content_filtered(response) -> bool:
+    # check if the response got filtered by content filter
+    if hasattr(response.choices[0], "content_filter_results"):
+        if is_filtered(response.choices[0].content_filter_results):
+            logging.warning("Failed due to content filtering. Retrying")
+            return True
+    return False
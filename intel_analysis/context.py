@@ -0,0 +1,82 @@
+import math
+import re
+
+# fields the LLM sees for each report
+CONTEXT_FIELDS = ("report_id", "date", "summary", "details", "classification", "country.name")
+
+# rough chars-per-token for English text with GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+HIGHLIGHT_MARKUP = re.compile(r"\*\*:violet-background\[|\]\*\*")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def field(doc: dict, name: str):
+    # precanned events nest country as an object, generated reports use a flat "country.name" key
+    if name in doc:
+        return doc[name]
+    parent, _, child = name.partition(".")
+    return doc.get(parent, {}).get(child) if child else None
+
+
+def plain_details(doc: dict) -> str:
+    details = field(doc, "details") or ""
+    if isinstance(details, list):
+        details = " ".join(details)
+    return HIGHLIGHT_MARKUP.sub("", details)
+
+
+def select_passages(text: str, query_text: str, max_tokens: int) -> str:
+    """Keep the sentences of `text` that best match the query within `max_tokens`,
+    in their original order."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    terms = {w.lower() for w in WORD.findall(query_text)}
+    sentences = SENTENCE_SPLIT.split(text)
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(terms & {w.lower() for w in WORD.findall(sentences[i])}), i),
+    )
+    keep, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        keep.add(i)
+        used += cost
+    if not keep:
+        # no whole sentence fits: hard-truncate the best one
+        return sentences[ranked[0]][: max_tokens * CHARS_PER_TOKEN]
+    return " ".join(sentences[i] for i in sorted(keep))
+
+
+def compact_report(doc: dict, details: str) -> str:
+    return (
+        f"[{field(doc, 'report_id')}] {field(doc, 'date')} | {field(doc, 'classification')} | {field(doc, 'country.name')}\n"
+        f"Summary: {field(doc, 'summary')}\n"
+        f"Details: {details}"
+    )
+
+
+def build_context(hits: list, query_text: str, max_tokens: int) -> str:
+    """Serialize reports compactly for the prompt, in rank order, within `max_tokens`.
+
+    A report whose details don't fit is cut down to its most query-relevant
+    sentences; reports after the budget runs out are dropped.
+    """
+    parts, used = [], 0
+    for doc in hits:
+        header = compact_report(doc, "")
+        remaining = max_tokens - used - estimate_tokens(header) - 1
+        if remaining <= 0:
+            break
+        details = select_passages(plain_details(doc), query_text, remaining)
+        part = compact_report(doc, details)
+        parts.append(part)
+        used += estimate_tokens(part) + 1
+    return "\n\n".join(parts)
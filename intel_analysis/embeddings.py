@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from itertools import islice
+
+from intel_analysis.expansion import infer_tokens
+from intel_analysis.generator import TEMPLATE_FIELD
+from intel_analysis.queries import ELSER_INFERENCE_ID
+from intel_analysis.serialization import dumps, loads
+
+# texts sent to the ELSER model per request
+EMBED_BATCH_SIZE = 64
+
+SLOT = re.compile(r"\{\d*\}")
+
+
+class EmbeddingCache:
+    """ELSER sparse vectors for document text, persisted on local disk (SQLite).
+
+    Each distinct text is embedded once; later ingests attach the stored
+    tokens to the documents and bypass the inference pipeline.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                tokens TEXT NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(inference_id: str, text: str) -> str:
+        return hashlib.sha256(f"{inference_id}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            for key in set(keys):
+                row = self._db.execute("SELECT tokens FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = loads(row[0])
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set_many(self, items: dict):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, tokens) VALUES (?, ?)",
+                ((key, dumps(tokens)) for key, tokens in items.items()),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def embed(es, inference_id: str, texts: list) -> list:
+    return infer_tokens(es, inference_id, texts)
+
+
+def blank_template(template: str) -> str:
+    # the template text with its slots left empty
+    return " ".join(SLOT.sub("", template).split())
+
+
+def merge_tokens(vectors: list) -> dict:
+    # union of the expansions, keeping each token's strongest weight
+    if len(vectors) == 1:
+        return vectors[0]
+    merged = {}
+    for tokens in vectors:
+        for token, weight in tokens.items():
+            if weight > merged.get(token, 0.0):
+                merged[token] = weight
+    return merged
+
+
+def embedding_inputs(doc: dict, input_field: str, templates: list | None) -> list:
+    template = doc.pop(TEMPLATE_FIELD, None)
+    if template is None or templates is None:
+        return [doc[input_field]]
+    return [blank_template(templates[template["index"]]), *template["slots"]]
+
+
+def attach_embeddings(
+    docs,
+    es,
+    cache: EmbeddingCache,
+    inference_id: str = ELSER_INFERENCE_ID,
+    input_field: str = "details",
+    output_field: str = "details_embeddings",
+    batch_size: int = EMBED_BATCH_SIZE,
+    templates: list | None = None,
+):
+    """Yield `docs` with `output_field` set to the sparse vector of `input_field`,
+    as the ingest pipeline would. Texts not in `cache` are embedded a batch at a
+    time and stored.
+
+    With `templates` (the details templates), reports generated with
+    record_template=True get the expansion of their blank template merged with
+    the expansions of their slot values instead, so inference runs once per
+    template and slot value rather than once per report. The random selector
+    slot is left out: its word pieces carry no meaning for ELSER.
+    """
+    # template and slot expansions, reused for the whole stream
+    known = {}
+    docs = iter(docs)
+    while batch := list(islice(docs, batch_size)):
+        inputs = [embedding_inputs(doc, input_field, templates) for doc in batch]
+        keys = {text: cache.key(inference_id, text) for parts in inputs for text in parts if text not in known}
+        tokens = cache.get_many(list(keys.values()))
+        missing = {key: text for text, key in keys.items() if key not in tokens}
+        if missing:
+            logging.debug(f"Embedding {len(missing)} texts with {inference_id}")
+            embedded = dict(zip(missing, embed(es, inference_id, list(missing.values()))))
+            cache.set_many(embedded)
+            tokens.update(embedded)
+        for doc, parts in zip(batch, inputs):
+            vectors = [known[text] if text in known else tokens[keys[text]] for text in parts]
+            if len(parts) > 1:
+                known.update(zip(parts, vectors))
+            doc[output_field] = merge_tokens(vectors)
+            yield doc
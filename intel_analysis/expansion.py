@@ -0,0 +1,62 @@
+import logging
+
+from intel_analysis.cache import TTLCache, normalize_query
+
+
+def infer_tokens(es, model_id: str, texts: list) -> list:
+    # ELSER is deployed as a trained model, which the _inference API (endpoints only) can't address
+    res = es.ml.infer_trained_model(model_id=model_id, docs=[{"text_field": text} for text in texts])
+    return [result["predicted_value"] for result in res["inference_results"]]
+
+
+async def infer_tokens_async(es, model_id: str, texts: list) -> list:
+    res = await es.ml.infer_trained_model(model_id=model_id, docs=[{"text_field": text} for text in texts])
+    return [result["predicted_value"] for result in res["inference_results"]]
+
+
+class ExpansionCache(TTLCache):
+    """Bounded store of ELSER query expansions (token -> weight).
+
+    Each distinct normalized query is sent to the ELSER model once; later
+    searches send the cached weights as a sparse_vector `query_vector`, so
+    the cluster doesn't run ELSER on the search path again.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 24 * 60 * 60):
+        super().__init__(maxsize, ttl)
+
+    @staticmethod
+    def key(inference_id: str, query_text: str) -> tuple:
+        # ELSER's tokenizer is uncased, so case doesn't change the expansion
+        return inference_id, normalize_query(query_text).lower()
+
+    def expand(self, es, inference_id: str, query_text: str) -> dict:
+        key = self.key(inference_id, query_text)
+        tokens = self.get(key)
+        if tokens is None:
+            logging.info(f"Expanding query with {inference_id}: {query_text}")
+            tokens = infer_tokens(es, inference_id, [key[1]])[0]
+            self.set(key, tokens)
+        return tokens
+
+    async def expand_async(self, es, inference_id: str, query_text: str) -> dict:
+        # same as expand(), with an AsyncElasticsearch client
+        key = self.key(inference_id, query_text)
+        tokens = self.get(key)
+        if tokens is None:
+            logging.info(f"Expanding query with {inference_id}: {query_text}")
+            tokens = (await infer_tokens_async(es, inference_id, [key[1]]))[0]
+            self.set(key, tokens)
+        return tokens
+
+
+def sparse_vector_query(field: str, inference_id: str, query_text: str, es=None, expansions: ExpansionCache | None = None) -> dict:
+    if expansions is None:
+        return {"sparse_vector": {"field": field, "inference_id": inference_id, "query": query_text}}
+    return {"sparse_vector": {"field": field, "query_vector": expansions.expand(es, inference_id, query_text)}}
+
+
+async def sparse_vector_query_async(field: str, inference_id: str, query_text: str, es=None, expansions: ExpansionCache | None = None) -> dict:
+    if expansions is None:
+        return sparse_vector_query(field, inference_id, query_text)
+    return {"sparse_vector": {"field": field, "query_vector": await expansions.expand_async(es, inference_id, query_text)}}
@@ -0,0 +1,236 @@
+import logging
+import multiprocessing
+import random
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# reports handed to a worker at a time; also the unit the RNG is seeded on, so
+# output for a given seed doesn't depend on the number of workers
+BATCH_SIZE = 10_000
+
+# key create_report(record_template=True) stores the template index and slot values under
+TEMPLATE_FIELD = "_template"
+
+# random_date() draws days (0-365), hours, minutes, seconds and microseconds each uniformly
+# over its full range, i.e. a uniform draw of microseconds over this span
+DATE_SPAN_US = 366 * 24 * 60 * 60 * 1_000_000
+
+# set in each pool worker by _init_worker
+_worker_data = None
+
+
+def generate_selector(rng: random.Random = random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def random_date(rng: random.Random = random, now: datetime | None = None) -> str:
+    current_datetime = now or datetime.now()
+
+    random_timedelta = timedelta(
+        days=rng.randint(0, 365),
+        hours=rng.randint(0, 23),
+        minutes=rng.randint(0, 59),
+        seconds=rng.randint(0, 59),
+        microseconds=rng.randint(0, 999999)
+    )
+
+    random_datetime = current_datetime - random_timedelta
+    return random_datetime.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def generate_summary(details):
+    sentences = details.split(". ")
+    if len(sentences) > 1:
+        summary = sentences[0] + "."
+    else:
+        summary = details
+    return summary
+
+
+def create_report(
+    i: int,
+    data: dict,
+    rng: random.Random = random,
+    now: datetime | None = None,
+    record_template: bool = False,
+) -> dict:
+    """Build one fake report.
+
+    With `record_template`, the report also carries a TEMPLATE_FIELD entry
+    with the details template index and the country/group slot values, for
+    embeddings.attach_embeddings to pop before indexing.
+    """
+    country = rng.choice(data["countries"])
+    group = rng.choice(data["groups"])
+    # same draw as rng.choice, so seeded output doesn't depend on record_template
+    template = rng.randrange(len(data["details_options"]))
+    details = data["details_options"][template].format(country["name"], group, generate_selector(rng))
+    summary = generate_summary(details)
+    report = {
+        "report_id": f"INT-2024-{i+1:03d}",
+        "date": random_date(rng, now),
+        "source": rng.choice(data["sources"]),
+        "group": group,
+        "country.name": country["name"],
+        "country.coordinates": country["coordinates"],
+        "country.code": country["code"],
+        "summary": summary,
+        "details": details,
+        "classification": rng.choice(data["classifications"]),
+        "compartments": rng.sample(data["compartments"], rng.randint(1, 4))
+    }
+    if record_template:
+        report[TEMPLATE_FIELD] = {"index": template, "slots": [country["name"], group]}
+    return report
+
+
+def batch_rng(seed: int | None, start: int) -> random.Random:
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}:{start}")
+
+
+def columnar_rng(seed: int | None, start: int) -> np.random.Generator:
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng(batch_rng(seed, start).getrandbits(128))
+
+
+def report_columns(data: dict, start: int, end: int, seed: int | None, now: datetime) -> dict:
+    # every random draw for the batch, one array per field
+    n = end - start
+    rng = columnar_rng(seed, start)
+    offsets = rng.integers(0, DATE_SPAN_US, n).astype("timedelta64[us]")
+    dates = np.datetime64(now.replace(tzinfo=None), "us") - offsets
+    compartment_order = np.argsort(rng.random((n, len(data["compartments"]))), axis=1)
+    return {
+        "country": rng.integers(0, len(data["countries"]), n).tolist(),
+        "group": rng.integers(0, len(data["groups"]), n).tolist(),
+        "template": rng.integers(0, len(data["details_options"]), n).tolist(),
+        "selector": rng.bytes(16 * n),
+        "date": np.datetime_as_string(dates, unit="us").tolist(),
+        "source": rng.integers(0, len(data["sources"]), n).tolist(),
+        "classification": rng.integers(0, len(data["classifications"]), n).tolist(),
+        # a random permutation per report, cut to 1-4 entries: a sample without replacement
+        "compartments": compartment_order[:, :4].tolist(),
+        "compartment_count": rng.integers(1, 5, n).tolist(),
+    }
+
+
+def columnar_reports(
+    data: dict,
+    start: int,
+    end: int,
+    seed: int | None,
+    now: datetime,
+    record_templates: bool = False,
+):
+    """Yield reports `start` to `end - 1` like create_report() does, from columns
+    drawn for the whole batch at once with NumPy; documents are only formatted
+    as they're consumed.
+
+    Seeded output is deterministic (and independent of the number of workers)
+    but differs from the per-report path's.
+    """
+    columns = report_columns(data, start, end, seed, now)
+    # strftime("%z") in random_date() is empty unless `now` is timezone-aware
+    tz = now.strftime("%z")
+    selectors = columns["selector"]
+    for j, i in enumerate(range(start, end)):
+        country = data["countries"][columns["country"][j]]
+        group = data["groups"][columns["group"][j]]
+        template = columns["template"][j]
+        selector = str(uuid.UUID(bytes=selectors[16 * j:16 * (j + 1)], version=4))
+        details = data["details_options"][template].format(country["name"], group, selector)
+        report = {
+            "report_id": f"INT-2024-{i+1:03d}",
+            "date": columns["date"][j] + tz,
+            "source": data["sources"][columns["source"][j]],
+            "group": group,
+            "country.name": country["name"],
+            "country.coordinates": country["coordinates"],
+            "country.code": country["code"],
+            "summary": generate_summary(details),
+            "details": details,
+            "classification": data["classifications"][columns["classification"][j]],
+            "compartments": [
+                data["compartments"][k] for k in columns["compartments"][j][:columns["compartment_count"][j]]
+            ],
+        }
+        if record_templates:
+            report[TEMPLATE_FIELD] = {"index": template, "slots": [country["name"], group]}
+        yield report
+
+
+def create_batch(
+    data: dict,
+    start: int,
+    end: int,
+    seed: int | None,
+    now: datetime,
+    record_templates: bool = False,
+    columnar: bool = False,
+) -> list:
+    if columnar:
+        return list(columnar_reports(data, start, end, seed, now, record_templates))
+    rng = batch_rng(seed, start)
+    return [create_report(i, data, rng, now, record_templates) for i in range(start, end)]
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _create_batch_in_worker(args):
+    return create_batch(_worker_data, *args)
+
+
+def batch_ranges(start: int, count: int, batch_size: int = BATCH_SIZE):
+    end = start + count
+    for batch_start in range(start, end, batch_size):
+        yield batch_start, min(batch_start + batch_size, end)
+
+
+def generate_reports(
+    count: int,
+    data: dict,
+    workers: int = 1,
+    seed: int | None = None,
+    start: int = 0,
+    now: datetime | None = None,
+    batch_size: int = BATCH_SIZE,
+    record_templates: bool = False,
+    columnar: bool = False,
+):
+    """Yield `count` reports in report ID order, built across a process pool.
+
+    With a seed, output is identical for any number of workers as long as
+    `now` (the anchor random dates count back from) is the same too.
+    `columnar` draws each batch with NumPy (see columnar_reports).
+    """
+    now = now or datetime.now()
+    tasks = ((s, e, seed, now, record_templates, columnar) for s, e in batch_ranges(start, count, batch_size))
+
+    if workers <= 1:
+        for task in tasks:
+            if columnar:
+                yield from columnar_reports(data, *task[:-1])
+            else:
+                yield from create_batch(data, *task)
+        return
+
+    logging.info(f"Generating reports with {workers} worker processes")
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(data,)) as pool:
+        # keep only a couple of batches per worker in flight so memory stays
+        # bounded when the consumer (e.g. bulk ingest) is slower than generation
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_create_batch_in_worker, (task,)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
@@ -0,0 +1,169 @@
+import logging
+from datetime import datetime, timezone
+
+from intel_analysis.queries import ELSER_INFERENCE_ID
+
+# bump when MAPPINGS or SETTINGS change; new indices are then created from the new template
+TEMPLATE_VERSION = 1
+PIPELINE_ID = "intel-workshop"
+
+MAPPINGS = {
+    # the ELSER tokens are only needed in the index for sparse_vector search; keeping them
+    # out of _source saves disk and keeps them out of every search response
+    "_source": {
+        "excludes": [
+            "details_embeddings"
+        ]
+    },
+    "properties": {
+        "classification": {"type": "keyword"},
+        "compartments": {"type": "keyword"},
+        "date": {"type": "date"},
+        "details": {"type": "text"},
+        "details_embeddings": {"type": "sparse_vector"},
+        "report_id": {"type": "keyword"},
+        "source": {"type": "keyword"},
+        "group": {"type": "keyword"},
+        "summary": {"type": "text", "fields": {"suggest": {"type": "search_as_you_type"}}},
+        "country.name": {"type": "keyword"},
+        "country.coordinates": {"type": "geo_point"},
+        "country.code": {"type": "keyword"},
+    }
+}
+
+SETTINGS = {
+    "index": {
+        "number_of_shards": "2",
+        "default_pipeline": PIPELINE_ID
+    }
+}
+
+PIPELINE_PROCESSORS = [
+    {
+        "inference": {
+            "model_id": ELSER_INFERENCE_ID,
+            "input_output": [
+                {
+                    "input_field": "details",
+                    "output_field": "details_embeddings"
+                }
+            ]
+        }
+    }
+]
+
+
+def template_name(alias: str) -> str:
+    return f"{alias}-template"
+
+
+def versioned_index(alias: str) -> str:
+    return f"{alias}-v{TEMPLATE_VERSION}"
+
+
+def timestamped_index(alias: str, now: datetime | None = None) -> str:
+    # a fresh index per rebuild, so the live one keeps serving searches meanwhile
+    now = now or datetime.now(timezone.utc)
+    return f"{versioned_index(alias)}-{now:%Y%m%d%H%M%S}"
+
+
+def put_pipeline(es):
+    logging.info("Creating/updating ingest pipeline")
+    es.ingest.put_pipeline(id=PIPELINE_ID, processors=PIPELINE_PROCESSORS)
+
+
+def put_template(es, alias: str):
+    # indices named <alias>-* pick up the mappings and settings automatically
+    name = template_name(alias)
+    if es.indices.exists_index_template(name=name):
+        current = es.indices.get_index_template(name=name)["index_templates"][0]["index_template"]
+        if current.get("version", 0) >= TEMPLATE_VERSION:
+            return
+    logging.info(f"Creating/updating index template {name} (version {TEMPLATE_VERSION})")
+    es.indices.put_index_template(
+        name=name,
+        index_patterns=[f"{alias}-*"],
+        template={"mappings": MAPPINGS, "settings": SETTINGS},
+        version=TEMPLATE_VERSION,
+        meta={"description": "Fake intel reports for the GenAI intel analysis demo"},
+    )
+
+
+def indices_behind(es, alias: str) -> list:
+    if es.indices.exists_alias(name=alias):
+        return list(es.indices.get_alias(name=alias).keys())
+    return []
+
+
+def write_index(es, alias: str) -> str | None:
+    # the index behind `alias` that takes writes (the only one, or the one flagged)
+    if not es.indices.exists_alias(name=alias):
+        return None
+    behind = es.indices.get_alias(name=alias)
+    for index, entry in behind.items():
+        if entry["aliases"][alias].get("is_write_index"):
+            return index
+    # several indices and none flagged: the newest (timestamped names sort by date)
+    return max(behind)
+
+
+def ensure_index(es, alias: str, reset: bool = False) -> str:
+    """Make sure the template, pipeline and a versioned index behind `alias` exist.
+
+    Returns the name of the index writes go to: the alias's current write
+    index if it has one. With `reset`, the indices currently behind the
+    alias are deleted first.
+    """
+    put_template(es, alias)
+    put_pipeline(es)
+
+    if reset:
+        for index in indices_behind(es, alias):
+            logging.info(f"Deleting existing index {index}")
+            es.indices.delete(index=index)
+
+    if es.indices.exists(index=alias) and not es.indices.exists_alias(name=alias):
+        # an index created before the template existed is using the alias name
+        if not reset:
+            logging.warning(f"{alias} is a concrete index, not an alias; reset to migrate it to {versioned_index(alias)}")
+            return alias
+        logging.info(f"Deleting existing index {alias}")
+        es.indices.delete(index=alias)
+
+    current = write_index(es, alias)
+    if current is not None:
+        # e.g. a timestamped index from a background rebuild; creating another would
+        # give the alias two write indices
+        return current
+
+    index = versioned_index(alias)
+    if not es.indices.exists(index=index):
+        logging.info(f"Creating index {index}")
+        es.indices.create(index=index, aliases={alias: {"is_write_index": True}})
+    elif not es.indices.exists_alias(name=alias, index=index):
+        es.indices.put_alias(index=index, name=alias, is_write_index=True)
+    return index
+
+
+def create_index(es, index: str):
+    # not behind the alias yet; swap_alias() makes it live once it's loaded
+    logging.info(f"Creating index {index}")
+    es.indices.create(index=index)
+
+
+def swap_alias(es, alias: str, index: str) -> list:
+    """Point `alias` at `index` alone, in one atomic update_aliases call.
+
+    A legacy concrete index named `alias` is dropped in the same call (an
+    alias can't be created while it exists). Returns the indices that were
+    behind the alias, for the caller to delete once in-flight searches are done.
+    """
+    previous = [name for name in indices_behind(es, alias) if name != index]
+    actions = [{"add": {"index": index, "alias": alias, "is_write_index": True}}]
+    actions += [{"remove": {"index": name, "alias": alias}} for name in previous]
+    if es.indices.exists(index=alias) and not es.indices.exists_alias(name=alias):
+        logging.info(f"Removing legacy index {alias}")
+        actions.append({"remove_index": {"index": alias}})
+    logging.info(f"Switching alias {alias} to {index}")
+    es.indices.update_aliases(actions=actions)
+    return previous
@@ -0,0 +1,105 @@
+import itertools
+import logging
+from datetime import datetime
+
+from intel_analysis.bulk import IngestOptions, parallel_ingest
+from intel_analysis.embeddings import EmbeddingCache, attach_embeddings
+from intel_analysis.generator import generate_reports
+from intel_analysis.index_template import ensure_index
+from intel_analysis.pipeline import bounded_stream
+from intel_analysis.refdata import ReferenceData
+from intel_analysis.tracing import span
+
+# no replicas to copy to and no refreshes while bulk loading
+BULK_LOAD_SETTINGS = {"number_of_replicas": "0", "refresh_interval": "-1"}
+
+
+def setup_es(es, index: str, reset: bool = False) -> str:
+    with span("setup_es"):
+        return ensure_index(es, index, reset)
+
+
+def report_stream(
+    reference_data: ReferenceData,
+    count: int,
+    workers: int = 1,
+    seed: int | None = None,
+    now: datetime | None = None,
+    es=None,
+    embeddings: EmbeddingCache | None = None,
+    template_embeddings: bool = False,
+    columnar: bool = False,
+):
+    """Generated reports followed by the precanned events.
+
+    Generation (and, with `embeddings`, attaching cached ELSER tokens) runs
+    ahead of ingest on a background thread, through a bounded queue. With
+    `template_embeddings`, generated reports get their tokens from per-template
+    and per-slot expansions rather than one inference per distinct text.
+    """
+    logging.info(f"Creating {count} fake intel reports")
+    data = reference_data.generator_data()
+    template_embeddings = template_embeddings and embeddings is not None
+    reports = generate_reports(
+        count, data, workers=workers, seed=seed, now=now, record_templates=template_embeddings, columnar=columnar
+    )
+    docs = itertools.chain(reports, reference_data.precanned_documents())
+    if embeddings is not None:
+        templates = data["details_options"] if template_embeddings else None
+        docs = attach_embeddings(docs, es, embeddings, templates=templates)
+    return bounded_stream(docs)
+
+
+def apply_bulk_load_settings(es, index: str) -> dict:
+    """Switch the indices behind `index` to bulk-load settings.
+
+    Returns their previous values (None where the setting was at its
+    default) for restore_settings().
+    """
+    keys = list(BULK_LOAD_SETTINGS)
+    res = es.indices.get_settings(index=index, name=[f"index.{key}" for key in keys])
+    previous = {}
+    for name, body in res.items():
+        settings = body.get("settings", {}).get("index", {})
+        previous[name] = {key: settings.get(key) for key in keys}
+    logging.info(f"Applying bulk-load settings to {', '.join(previous)}")
+    es.indices.put_settings(index=index, settings={"index": BULK_LOAD_SETTINGS})
+    return previous
+
+
+def restore_settings(es, previous: dict):
+    for name, settings in previous.items():
+        # a None value resets the setting to the cluster default
+        es.indices.put_settings(index=name, settings={"index": settings})
+
+
+def bulk_ingest(
+    es,
+    index: str,
+    docs,
+    options: IngestOptions | None = None,
+    on_progress=None,
+    force_merge: bool = True,
+) -> tuple:
+    """Bulk load `docs` into `index` with bulk-load settings applied.
+
+    Settings are restored afterwards (even if ingest fails), the index is
+    refreshed and, optionally, force-merged down to one segment in the
+    background. Returns (indexed_count, errors).
+    """
+    with span("bulk_ingest"):
+        previous = apply_bulk_load_settings(es, index)
+        try:
+            with span("bulk_ingest.load"):
+                indexed, errors = parallel_ingest(es, index, docs, options, on_progress=on_progress)
+        finally:
+            logging.info("Restoring index settings")
+            with span("bulk_ingest.restore"):
+                restore_settings(es, previous)
+                es.indices.refresh(index=index)
+
+        logging.info(f"Indexed {indexed} documents")
+        if force_merge:
+            logging.info("Force merging")
+            es.indices.forcemerge(index=index, max_num_segments=1, wait_for_completion=False)
+        return indexed, errors
@@ -0,0 +1,422 @@
+import logging
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from operator import neg
+
+import numpy as np
+
+from intel_analysis.backends import SearchBackend, UnsupportedQuery
+from intel_analysis.cache import TTLCache
+from intel_analysis.context import WORD, field
+from intel_analysis.generator import TEMPLATE_FIELD
+from intel_analysis.query_compiler import TERM_FILTERS
+
+# Elasticsearch's BM25 defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# postings read per term in the first round of top-k; doubled each round after that
+FIRST_BLOCK = 128
+
+# top-k scores every matching doc instead once it would read more than count / DENSE_FRACTION
+# postings (queries made only of very common words), and scores the filtered docs directly
+# when a filter matches fewer reports than that
+DENSE_FRACTION = 64
+
+# query_string operators (only uppercase ones are operators); dropped, the rest are OR'd terms
+OPERATORS = {"AND", "OR", "NOT"}
+
+# not searched or returned by the local index
+SKIP_FIELDS = {"details_embeddings", TEMPLATE_FIELD}
+
+KEYWORD_FIELDS = tuple(name for _, name in TERM_FILTERS)
+
+DATE_MATH = re.compile(r"now(?:([+-])(\d+)([wdhms]))?(?:/([yMdh]))?")
+DATE_MATH_UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes", "s": "seconds"}
+
+
+def _floor(t: datetime, unit: str) -> datetime:
+    t = t.replace(minute=0, second=0, microsecond=0)
+    if unit in "yMd":
+        t = t.replace(hour=0)
+    if unit in "yM":
+        t = t.replace(day=1)
+    if unit == "y":
+        t = t.replace(month=1)
+    return t
+
+
+def _next(t: datetime, unit: str) -> datetime:
+    # start of the period after the one `t` (already floored) starts
+    if unit == "y":
+        return t.replace(year=t.year + 1)
+    if unit == "M":
+        return t.replace(year=t.year + t.month // 12, month=t.month % 12 + 1)
+    return t + timedelta(**{"d": {"days": 1}, "h": {"hours": 1}}[unit])
+
+
+def resolve_date(value: str, bound: str, now: datetime) -> np.datetime64:
+    """A range bound (absolute, or `now` date math) as a UTC timestamp.
+
+    Rounding follows Elasticsearch: down for gte/lt, up to the end of the
+    period for gt/lte.
+    """
+    match = DATE_MATH.fullmatch(value)
+    if match is None:
+        return np.datetime64(value, "us")
+    sign, amount, unit, round_to = match.groups()
+    t = now
+    if amount:
+        delta = timedelta(**{DATE_MATH_UNITS[unit]: int(amount)})
+        t = t - delta if sign == "-" else t + delta
+    if round_to:
+        t = _floor(t, round_to)
+        if bound in ("gt", "lte"):
+            t = _next(t, round_to) - timedelta(microseconds=1)
+    return np.datetime64(t, "us")
+
+
+def highlight(value, terms: set, pre_tag: str, post_tag: str) -> list:
+    # whole-field highlights (number_of_fragments: 0): one entry per matching value
+    fragments = []
+    for text in value if isinstance(value, list) else [value]:
+        matched = False
+
+        def tag(match):
+            nonlocal matched
+            if match.group().lower() not in terms:
+                return match.group()
+            matched = True
+            return f"{pre_tag}{match.group()}{post_tag}"
+
+        text = WORD.sub(tag, text)
+        if matched:
+            fragments.append(text)
+    return fragments
+
+
+def source_filter(doc: dict, fields: list | None) -> dict:
+    # `country.name` matches both the flat key (generated reports) and the nested object (precanned events)
+    if fields is None:
+        return doc
+    source = {}
+    for name in fields:
+        if name in doc:
+            source[name] = doc[name]
+            continue
+        parent, _, child = name.partition(".")
+        if child and isinstance(doc.get(parent), dict) and child in doc[parent]:
+            source.setdefault(parent, {})[child] = doc[parent][child]
+    return source
+
+
+class LocalIndex(SearchBackend):
+    """In-memory BM25 index over the reports, for running without a cluster.
+
+    Answers the lexical (query_string) searches built in queries.py, with the
+    same filters and highlight markup as Elasticsearch. Query text is split
+    into lowercased words, like the standard analyzer, and the words are
+    OR'd; query_string syntax beyond that isn't supported.
+
+    Postings are flat NumPy arrays, stored twice per term: in doc order, for
+    looking up a doc's score, and in descending BM25 impact order, so the
+    top hits are usually found after reading the head of each list. Keyword
+    filters are precomputed packed bitsets, one per (field, value).
+    """
+
+    name = "local"
+    supports_sparse_vector = False
+
+    def __init__(self, docs, text_field: str = "details", k1: float = BM25_K1, b: float = BM25_B):
+        start = time.perf_counter()
+        self.text_field = text_field
+        self.vocabulary = {}
+        self.sources = []
+        term_ids, doc_ids, freqs, lengths = array("i"), array("i"), array("i"), array("i")
+        keyword_docs = {}
+        dates = []
+        for doc_id, doc in enumerate(docs):
+            doc = {key: value for key, value in doc.items() if key not in SKIP_FIELDS}
+            self.sources.append(doc)
+            text = field(doc, text_field) or ""
+            if isinstance(text, list):
+                text = " ".join(text)
+            tokens = WORD.findall(text.lower())
+            lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                freqs.append(count)
+            for name in KEYWORD_FIELDS:
+                values = field(doc, name)
+                for value in values if isinstance(values, list) else [values]:
+                    if value is not None:
+                        keyword_docs.setdefault((name, value), array("i")).append(doc_id)
+            dates.append(field(doc, "date") or "NaT")
+
+        self.count = len(self.sources)
+        self.dates = np.array(dates, dtype="datetime64[us]")
+        self.bitsets = {}
+        for key, ids in keyword_docs.items():
+            mask = np.zeros(self.count, dtype=bool)
+            mask[np.frombuffer(ids, dtype=np.int32)] = True
+            self.bitsets[key] = np.packbits(mask)
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        doc_ids = np.frombuffer(doc_ids, dtype=np.int32)
+        freqs = np.frombuffer(freqs, dtype=np.int32).astype(np.float32)
+        lengths = np.frombuffer(lengths, dtype=np.int32).astype(np.float32)
+
+        # CSR layout: term t's postings are [offsets[t], offsets[t + 1])
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=self.offsets[1:])
+        by_term = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, freqs = term_ids[by_term], doc_ids[by_term], freqs[by_term]
+
+        # Lucene's BM25: idf * tf / (tf + k1 * (1 - b + b * dl / avgdl))
+        idf = np.log1p((self.count - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        norms = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0)) if self.count else lengths
+        impacts = idf[term_ids] * freqs / (freqs + norms[doc_ids])
+
+        self.doc_ids, self.impacts = doc_ids, impacts
+        by_impact = np.lexsort((doc_ids, -impacts, term_ids))
+        self.ranked_doc_ids, self.ranked_impacts = doc_ids[by_impact], impacts[by_impact]
+
+        # compiled filter masks, keyed on the resolved clauses (date math included)
+        self._masks = TTLCache(maxsize=256, ttl=24 * 60 * 60)
+        logging.info(
+            f"Built local index: {self.count} docs, {len(self.vocabulary)} terms, "
+            f"{len(self.doc_ids)} postings in {time.perf_counter() - start:.1f}s"
+        )
+
+    def _query_words(self, query_text: str) -> list:
+        # lowercased query words that are in the index; each occurrence is a scoring clause
+        words = (word.lower() for word in WORD.findall(query_text) if word not in OPERATORS)
+        return [word for word in words if word in self.vocabulary]
+
+    def _filter_key(self, clauses: list, now: datetime) -> tuple:
+        key = []
+        for clause in clauses:
+            if "terms" in clause:
+                ((name, values),) = clause["terms"].items()
+                key.append(("terms", name, tuple(values)))
+            elif "term" in clause:
+                ((name, value),) = clause["term"].items()
+                key.append(("terms", name, (value.get("value") if isinstance(value, dict) else value,)))
+            elif "range" in clause and set(clause["range"]) == {"date"}:
+                bounds = clause["range"]["date"]
+                key.append(("range", "date", tuple(sorted(
+                    (bound, resolve_date(value, bound, now)) for bound, value in bounds.items()
+                ))))
+            else:
+                raise UnsupportedQuery(f"The local index doesn't support this filter: {clause}")
+        return tuple(key)
+
+    def _filter_mask(self, clauses: list) -> np.ndarray | None:
+        if not clauses:
+            return None
+        key = self._filter_key(clauses, datetime.now(timezone.utc).replace(tzinfo=None))
+        mask = self._masks.get(key)
+        if mask is None:
+            bits = None
+            for kind, name, spec in key:
+                if kind == "terms":
+                    clause_bits = np.zeros((self.count + 7) // 8, dtype=np.uint8)
+                    for value in spec:
+                        if (name, value) in self.bitsets:
+                            clause_bits |= self.bitsets[(name, value)]
+                else:
+                    in_range = np.ones(self.count, dtype=bool)
+                    for bound, value in spec:
+                        in_range &= {
+                            "gte": np.greater_equal,
+                            "gt": np.greater,
+                            "lte": np.less_equal,
+                            "lt": np.less,
+                        }[bound](self.dates, value)
+                    clause_bits = np.packbits(in_range)
+                bits = clause_bits if bits is None else bits & clause_bits
+            mask = np.unpackbits(bits, count=self.count).view(bool)
+            self._masks.set(key, mask)
+        return mask
+
+    def _ranges(self, terms: dict) -> list:
+        # (start, end, weight, best weighted impact) per term, in ascending order of the best impact
+        return sorted(
+            (
+                (self.offsets[term], self.offsets[term + 1], weight, weight * float(self.ranked_impacts[self.offsets[term]]))
+                for term, weight in terms.items()
+            ),
+            key=lambda r: r[3],
+        )
+
+    def _scores(self, candidates: np.ndarray, ranges: list, threshold: float = 0.0) -> tuple:
+        """Exact scores of `candidates`, dropping those that can't reach `threshold`.
+
+        Terms are looked up best impact first. Before each lookup, candidates
+        whose score so far plus the best impacts still to come is below the
+        threshold are dropped, so the common words are only looked up for
+        the docs still in the running.
+        """
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        remaining = sum(best for _, _, _, best in ranges)
+        for start, end, weight, best in reversed(ranges):
+            if threshold > 0:
+                keep = scores + remaining >= threshold
+                candidates, scores = candidates[keep], scores[keep]
+            postings = self.doc_ids[start:end]
+            positions = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            found = postings[positions] == candidates
+            scores += weight * np.where(found, self.impacts[start:end][positions], 0)
+            remaining -= best
+        return candidates, scores
+
+    def _dense_top_k(self, terms: dict, mask: np.ndarray | None, k: int, floor: float = 0) -> tuple:
+        # `floor`: a score the k-th best is known to reach, so only docs at or above it are ranked
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term, weight in terms.items():
+            start, end = self.offsets[term], self.offsets[term + 1]
+            # a term's postings hold each doc once, so the fancy-indexed add is safe
+            scores[self.doc_ids[start:end]] += weight * self.impacts[start:end]
+        if mask is not None:
+            scores *= mask
+        if floor > 0:
+            best_ids = np.flatnonzero(scores >= floor)
+        else:
+            best_ids = np.argpartition(-scores, k - 1)[:k] if self.count > k else np.arange(self.count)
+            best_ids = best_ids[scores[best_ids] > 0]
+        if len(best_ids) > k:
+            best_ids = best_ids[np.argpartition(-scores[best_ids], k - 1)[:k]]
+        best_ids = best_ids.astype(np.int32)
+        return best_ids, scores[best_ids]
+
+    def _reach(self, ranges: list, threshold: float) -> list:
+        """How far down each impact-ordered list a doc could still beat `threshold`.
+
+        `ranges` are in ascending order of their best impact (MaxScore's
+        order). A doc only needs reading from the list of its highest-ordered
+        term, where it can score at most its impact there plus the best
+        impacts of the lists before it; once that sum is no more than the
+        threshold, the rest of the list can't add a top-k doc. Common words,
+        whose best impact is low, are usually not read at all.
+        """
+        limits = []
+        lower = 0.0
+        for start, end, weight, best in ranges:
+            cutoff = (threshold - lower) / weight
+            if cutoff <= 0:
+                limits.append(end - start)
+            elif cutoff >= self.ranked_impacts[start]:
+                limits.append(0)
+            else:
+                # impacts are descending, so search on their negation
+                limits.append(bisect_left(self.ranked_impacts, -cutoff, start, end, key=neg) - start)
+            lower += best
+        return limits
+
+    def top_k(self, terms: dict, mask: np.ndarray | None, k: int) -> tuple:
+        """The k best (doc ids, scores), best first.
+
+        Reads the impact-ordered postings a block at a time, scoring each new
+        doc exactly. The k-th best score so far is a threshold the final top
+        k must reach, and `_reach` limits each list to the postings that could
+        still beat it, so reading stops once every list has been read that
+        far. Docs tied with the k-th best are interchangeable, so reading
+        doesn't go on to find them all. Searches whose filter matches few
+        reports score those reports directly, and searches that would read
+        more than count / DENSE_FRACTION postings are scored exhaustively.
+        """
+        if mask is not None and np.count_nonzero(mask) <= max(self.count // DENSE_FRACTION, k):
+            candidates, scores = self._scores(np.flatnonzero(mask).astype(np.int32), self._ranges(terms))
+            best_ids, best_scores = candidates[scores > 0], scores[scores > 0]
+            if len(best_ids) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_ids, best_scores = best_ids[keep], best_scores[keep]
+            order = np.lexsort((best_ids, -best_scores))
+            return best_ids[order], best_scores[order]
+
+        ranges = self._ranges(terms)
+        best_ids = np.empty(0, dtype=np.int32)
+        best_scores = np.empty(0, dtype=np.float32)
+        depth, block, read = 0, FIRST_BLOCK, 0
+        while True:
+            threshold = float(best_scores.min()) if len(best_ids) == k else 0.0
+            # a little under the threshold, so float32 rounding can't drop the current top k
+            floor = threshold * (1 - 1e-5)
+            limits = self._reach(ranges, threshold)
+            if all(limit <= depth for limit in limits):
+                break
+            slices = [
+                (start + depth, start + min(limit, depth + block)) for (start, _, _, _), limit in zip(ranges, limits) if limit > depth
+            ]
+            read += sum(stop - first for first, stop in slices)
+            if read > self.count // DENSE_FRACTION:
+                best_ids, best_scores = self._dense_top_k(terms, mask, k, floor)
+                break
+            candidates = np.concatenate([best_ids] + [self.ranked_doc_ids[first:stop] for first, stop in slices])
+            depth += block
+            block *= 2
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            candidates, scores = self._scores(np.unique(candidates), ranges, floor)
+            if len(candidates) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                candidates, scores = candidates[keep], scores[keep]
+            best_ids, best_scores = candidates, scores
+        order = np.lexsort((best_ids, -best_scores))
+        return best_ids[order], best_scores[order]
+
+    def search(self, body: dict) -> dict:
+        start = time.perf_counter()
+        standard = body.get("retriever", {}).get("standard")
+        query = (standard or {}).get("query", {})
+        if "query_string" not in query:
+            raise UnsupportedQuery(
+                "The local index only runs lexical (query_string) searches; ELSER and hybrid search need Elasticsearch"
+            )
+        query_string = query["query_string"]
+        if query_string.get("default_field", self.text_field) != self.text_field:
+            raise UnsupportedQuery(f"The local index only searches the {self.text_field} field")
+
+        words = self._query_words(query_string["query"])
+        terms = dict(Counter(self.vocabulary[word] for word in words))
+        mask = self._filter_mask(standard.get("filter", []))
+        size = body.get("size", 10)
+        doc_ids, scores = self.top_k(terms, mask, size) if terms and size else ([], [])
+
+        highlight_spec = body.get("highlight")
+        hits = []
+        for doc_id, score in zip(doc_ids, scores):
+            doc = self.sources[doc_id]
+            hit = {"_index": self.name, "_id": str(doc_id), "_score": float(score), "_source": source_filter(doc, body.get("_source"))}
+            if highlight_spec:
+                hit["highlight"] = {}
+                for name in highlight_spec["fields"]:
+                    value = field(doc, name)
+                    fragments = highlight(value, set(words), highlight_spec["pre_tags"][0], highlight_spec["post_tags"][0]) if value else []
+                    if fragments:
+                        hit["highlight"][name] = fragments
+            hits.append(hit)
+        return {
+            "took": round((time.perf_counter() - start) * 1000),
+            "timed_out": False,
+            "hits": {
+                # reading stops early, so the count is a lower bound
+                "total": {"value": len(hits), "relation": "gte"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits,
+            },
+        }
+
+
+def build_local_index(reference_data, count: int, workers: int = 1, seed: int | None = None) -> LocalIndex:
+    """A local index of `count` generated reports and the precanned events."""
+    # imported here: ingest pulls in the bulk and embedding code, which the index doesn't need
+    from intel_analysis.ingest import report_stream
+
+    return LocalIndex(report_stream(reference_data, count, workers=workers, seed=seed, columnar=True))
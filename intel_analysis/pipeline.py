@@ -0,0 +1,60 @@
+import logging
+import queue
+import threading
+
+
+# enough to keep a couple of bulk requests' worth of docs ready without
+# letting a fast generator run away from a slow cluster
+DEFAULT_QUEUE_SIZE = 5_000
+
+_DONE = object()
+
+
+class _ProducerError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def bounded_stream(docs, maxsize: int = DEFAULT_QUEUE_SIZE):
+    """Iterate `docs` on a background thread through a bounded queue.
+
+    Generation overlaps with whatever consumes this generator (e.g.
+    streaming_bulk), while at most `maxsize` docs are held in memory.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for doc in docs:
+                if not put(doc):
+                    return
+            put(_DONE)
+        except Exception as e:
+            logging.error(f"Document producer failed: {e}")
+            put(_ProducerError(e))
+
+    producer = threading.Thread(target=produce, name="doc-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _ProducerError):
+                raise item.exc
+            yield item
+    finally:
+        # unblock the producer if the consumer stops early
+        stop.set()
+        producer.join()
@@ -0,0 +1,27 @@
+from intel_analysis.context import build_context
+
+LLM_SYSTEM_PROMPT = """
+                    Assistant is a large language model trained by OpenAI. 
+                    Be succint, answer in 15 words or less. 
+                    If you don't know the answer, say that you don't know. 
+                    Don't hallucinate. 
+                    Don't ask follow up questions.
+                    Do not include the number of words in your response.
+                """
+
+
+def rag_prompt(es_hits: list, query_text: str, today: str, max_tokens: int = 1500) -> str:
+    # only the needed fields, compactly serialized and capped at a token budget
+    context = build_context(es_hits, query_text, max_tokens)
+    return f"""
+        Intelligence Reports:
+        {context}
+
+        Instructions:
+        Answer the user's question using the intelligence reports text above only.
+        Answer as if you are addressing a US intelligence analyst or Military officer.
+        Keep in mind today's date is {today}.
+        Keep your answer grounded in the facts of the intelligence reports.
+        Summarize the intelligence report's details field and respond using 20 words or less.
+        Do not include the number of words in your response.
+    """
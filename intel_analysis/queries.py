@@ -0,0 +1,91 @@
+from intel_analysis.context import CONTEXT_FIELDS
+
+ELSER_INFERENCE_ID = ".elser_model_2_linux-x86_64"
+NUM_RESULTS = 3
+RRF_RANK_WINDOW_SIZE = 50
+RRF_RANK_CONSTANT = 60
+
+# what the UI renders (and the RAG context is built from); leaves out details_embeddings
+SOURCE_FIELDS = list(CONTEXT_FIELDS) + ["source", "compartments"]
+
+HIGHLIGHT = {
+    "pre_tags": ["**:violet-background["],
+    "post_tags": ["]**"],
+    "fields": {"details": {"number_of_fragments": 0}},
+}
+
+
+def query_string_clause(query_text: str) -> dict:
+    return {
+        "query_string": {
+            "default_field": "details",
+            "query": query_text,
+        }
+    }
+
+
+# `search_filters` below are filter-context clauses from query_compiler.compile_filters
+
+
+def basic_query(query_text: str, search_filters: list) -> dict:
+    return {
+        "size": NUM_RESULTS,
+        "_source": SOURCE_FIELDS,
+        "retriever": {
+            "standard": {
+                "query": query_string_clause(query_text),
+                "filter": search_filters
+            }
+        },
+        "highlight": HIGHLIGHT,
+    }
+
+
+def elser_query(sparse_vector: dict, search_filters: list) -> dict:
+    # `sparse_vector` is the query clause from expansion.sparse_vector_query
+    return {
+        "size": NUM_RESULTS,
+        "_source": SOURCE_FIELDS,
+        "retriever": {
+            "standard": {
+                "query": sparse_vector,
+                "filter": search_filters
+            }
+        },
+    }
+
+
+def hybrid_query(query_text: str, sparse_vector: dict, search_filters: list) -> dict:
+    # lexical and ELSER relevance fused server-side with reciprocal rank fusion
+    return {
+        "size": NUM_RESULTS,
+        "_source": SOURCE_FIELDS,
+        "retriever": {
+            "rrf": {
+                "retrievers": [
+                    {
+                        "standard": {
+                            "query": query_string_clause(query_text),
+                            "filter": search_filters
+                        }
+                    },
+                    {
+                        "standard": {
+                            "query": sparse_vector,
+                            "filter": search_filters
+                        }
+                    },
+                ],
+                "rank_window_size": RRF_RANK_WINDOW_SIZE,
+                "rank_constant": RRF_RANK_CONSTANT,
+            }
+        },
+    }
+
+
+def basic_hits(res) -> list:
+    return [hit["_source"] | hit["highlight"] for hit in res["hits"]["hits"]]
+
+
+def elser_hits(res) -> list:
+    return [hit["_source"] for hit in res["hits"]["hits"]]
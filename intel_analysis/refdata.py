@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # fall back to checking mtimes on every get()
+    Observer = None
+    FileSystemEventHandler = object
+
+
+DATA_FILES = {
+    "countries": "countries.json",
+    "groups": "groups.json",
+    "sources": "sources.json",
+    "details_options": "details.json",
+    "classifications": "classifications.json",
+    "compartments": "compartments.json",
+    "precanned_events": "precanned-events.json",
+}
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    countries: tuple
+    groups: tuple
+    sources: tuple
+    details_options: tuple
+    classifications: tuple
+    compartments: tuple
+    precanned_events: tuple
+    style: str
+    # precomputed for the UI
+    country_names: tuple
+
+    def generator_data(self) -> dict:
+        # plain (picklable) copies for the generator's worker processes
+        return {key: thaw(getattr(self, key)) for key in DATA_FILES if key != "precanned_events"}
+
+    def precanned_documents(self) -> list:
+        # plain dicts, ready to be serialized for ingest
+        return thaw(self.precanned_events)
+
+
+def load_reference_data(data_dir: str, style_path: str | None = None) -> ReferenceData:
+    logging.info(f"Loading reference data from {data_dir}")
+    data = {}
+    for key, name in DATA_FILES.items():
+        with open(os.path.join(data_dir, name), "r") as file:
+            data[key] = freeze(json.load(file))
+
+    style = ""
+    if style_path:
+        with open(style_path, "r") as f:
+            style = f.read()
+
+    return ReferenceData(
+        **data,
+        style=style,
+        country_names=tuple(country["name"] for country in data["countries"]),
+    )
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, store):
+        self.store = store
+
+    def on_any_event(self, event):
+        # newer watchdog versions also report opens/closes, which our own reads trigger
+        if event.event_type not in ("created", "modified", "moved", "deleted"):
+            return
+        paths = {os.path.abspath(event.src_path), os.path.abspath(getattr(event, "dest_path", "") or event.src_path)}
+        if paths & self.store.watched_paths:
+            self.store.invalidate()
+
+
+class ReferenceDataStore:
+    """Loads the reference data once and hands out the same immutable
+    ReferenceData until one of the underlying files changes."""
+
+    def __init__(self, data_dir: str = "data", style_path: str | None = None):
+        self.data_dir = data_dir
+        self.style_path = style_path
+        self.watched_paths = {os.path.abspath(os.path.join(data_dir, name)) for name in DATA_FILES.values()}
+        if style_path:
+            self.watched_paths.add(os.path.abspath(style_path))
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtimes = None
+        self._dirty = True
+        self._observer = self._start_observer()
+
+    def _start_observer(self):
+        if Observer is None:
+            return None
+        observer = Observer()
+        handler = _ChangeHandler(self)
+        for directory in {os.path.dirname(path) for path in self.watched_paths}:
+            observer.schedule(handler, directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _current_mtimes(self):
+        return {path: os.stat(path).st_mtime_ns for path in self.watched_paths}
+
+    def invalidate(self):
+        self._dirty = True
+
+    def get(self) -> ReferenceData:
+        with self._lock:
+            if self._observer is None:
+                mtimes = self._current_mtimes()
+                self._dirty = self._dirty or mtimes != self._mtimes
+                self._mtimes = mtimes
+            if self._dirty or self._data is None:
+                # clear the flag first so a change during the load triggers another one
+                self._dirty = False
+                try:
+                    self._data = load_reference_data(self.data_dir, self.style_path)
+                except (OSError, ValueError) as e:
+                    if self._data is None:
+                        raise
+                    # keep serving the last good copy while a file is mid-write
+                    logging.warning(f"Failed to reload reference data, keeping previous copy: {e}")
+                    self._dirty = True
+            return self._data
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+
+from intel_analysis.bulk import IngestOptions
+from intel_analysis.index_template import (
+    create_index,
+    put_pipeline,
+    put_template,
+    swap_alias,
+    timestamped_index,
+)
+from intel_analysis.ingest import bulk_ingest
+from intel_analysis.tracing import span
+
+# old indices are deleted this long after the alias switch, so searches already
+# running against them can finish
+RETIRE_DELAY_SECONDS = 30
+
+# keyword fields the UI filters on; aggregating them once loads their global ordinals
+WARM_FIELDS = ("classification", "compartments", "source", "country.name")
+
+
+def warm_index(es, index: str):
+    # first searches on a new index otherwise pay for loading ordinals and filling caches
+    logging.info(f"Warming {index}")
+    es.search(
+        index=index,
+        size=0,
+        aggs={name: {"terms": {"field": name}} for name in WARM_FIELDS},
+        request_cache=True,
+    )
+    es.search(index=index, size=1, query={"query_string": {"default_field": "details", "query": "*"}})
+
+
+class RebuildJob:
+    """Builds a fresh index behind `alias` on a background thread.
+
+    The new index is created from the template, loaded from `make_docs()`,
+    warmed, then swapped in atomically; searches keep hitting the old index
+    until then. Progress is read from `snapshot()`.
+    """
+
+    def __init__(self, es, alias: str, make_docs, total: int, options: IngestOptions | None = None, on_swap=None):
+        self.es = es
+        self.alias = alias
+        self.make_docs = make_docs
+        self.total = total
+        self.options = options
+        self.on_swap = on_swap
+        self.index = timestamped_index(alias)
+        self.status = "pending"
+        self.indexed = 0
+        self.errors = []
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"rebuild-{self.index}", daemon=True)
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _set(self, **state):
+        with self._lock:
+            for key, value in state.items():
+                setattr(self, key, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = (self.finished or time.monotonic()) - self.started if self.started else 0
+            return {
+                "index": self.index,
+                "status": self.status,
+                "indexed": self.indexed,
+                "total": self.total,
+                "errors": len(self.errors),
+                "error": self.error,
+                "elapsed": elapsed,
+            }
+
+    def _on_progress(self, indexed: int):
+        self._set(indexed=indexed)
+
+    def _run(self):
+        swapped = False
+        try:
+            put_template(self.es, self.alias)
+            put_pipeline(self.es)
+            create_index(self.es, self.index)
+
+            self._set(status="indexing")
+            indexed, errors = bulk_ingest(
+                self.es, self.index, self.make_docs(), self.options, on_progress=self._on_progress
+            )
+            self._set(indexed=indexed, errors=errors)
+            if errors or indexed < self.total:
+                # don't swap analysts onto an empty or partial index (e.g. the ELSER pipeline rejected every doc)
+                raise RuntimeError(f"Indexed {indexed} of {self.total} reports with {len(errors)} errors; keeping the current index")
+
+            self._set(status="warming")
+            with span("rebuild.warm"):
+                warm_index(self.es, self.index)
+
+            self._set(status="switching")
+            with span("rebuild.swap"):
+                previous = swap_alias(self.es, self.alias, self.index)
+            swapped = True
+            if self.on_swap is not None:
+                self.on_swap()
+
+            if previous:
+                self._set(status="retiring")
+                time.sleep(RETIRE_DELAY_SECONDS)
+                for name in previous:
+                    logging.info(f"Deleting old index {name}")
+                    self.es.indices.delete(index=name, ignore_unavailable=True)
+            self._set(status="done")
+        except Exception as e:
+            logging.exception(f"Rebuilding {self.alias} failed")
+            self._set(status="failed", error=str(e))
+            if swapped:
+                return
+            # the alias still points at the old index; drop the half-built one
+            try:
+                self.es.indices.delete(index=self.index, ignore_unavailable=True)
+            except Exception:
+                logging.exception(f"Could not delete {self.index}")
+        finally:
+            self._set(finished=time.monotonic())
+
+
+class Reindexer:
+    """Runs at most one RebuildJob at a time and keeps the latest for status polling."""
+
+    def __init__(self):
+        self.job = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.job is not None and self.job.running
+
+    def start(self, *args, **kwargs) -> RebuildJob:
+        with self._lock:
+            if self.running:
+                raise RuntimeError(f"Already rebuilding {self.job.alias} into {self.job.index}")
+            self.job = RebuildJob(*args, **kwargs).start()
+            return self.job
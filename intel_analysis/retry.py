@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import openai
+from elasticsearch import ApiError, ConnectionError, ConnectionTimeout
+
+
+class RetryError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def es_retryable(e: Exception) -> bool:
+    if isinstance(e, (ConnectionError, ConnectionTimeout)):
+        return True
+    return isinstance(e, ApiError) and e.meta.status in (429, 502, 503, 504)
+
+
+def openai_retryable(e: Exception) -> bool:
+    return isinstance(
+        e,
+        (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError, openai.InternalServerError),
+    )
+
+
+class CircuitBreaker:
+    """Stops calling an endpoint after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds one trial call is let through; its outcome
+    closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                raise CircuitOpenError(f"{self.name} circuit is open after {self.failures} consecutive failures")
+            if self.state == "half-open":
+                # let a single trial call through; others wait for another reset_timeout
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.error(f"Opening {self.name} circuit after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """Bounded retries with jittered exponential backoff and an overall deadline.
+
+    Keeps counters of calls, retries and give-ups for monitoring.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float | None = 30.0,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker
+        self.calls = 0
+        self.retries = 0
+        self.give_ups = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        # "full jitter": anywhere between 0 and the exponential delay
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _next_delay(self, attempt: int, started: float) -> float:
+        # raises RetryError when out of attempts or time, else counts a retry
+        remaining = None if self.deadline is None else self.deadline - (time.monotonic() - started)
+        if attempt >= self.max_attempts or (remaining is not None and remaining <= 0):
+            self._count("give_ups")
+            logging.error(f"{self.name}: giving up after {attempt} attempt(s)")
+            raise RetryError(f"{self.name} failed after {attempt} attempt(s)")
+
+        delay = self.backoff(attempt)
+        if remaining is not None:
+            delay = min(delay, remaining)
+        self._count("retries")
+        logging.warning(f"{self.name}: attempt {attempt} failed, retrying in {delay:.2f}s")
+        return delay
+
+    def attempts(self):
+        """Yield attempt numbers, sleeping between them.
+
+        Asking for another attempt after the last one (or past the deadline)
+        raises RetryError, so callers `continue` to retry and `break` on success.
+        """
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_call()
+            yield attempt
+            time.sleep(self._next_delay(attempt, started))
+            attempt += 1
+
+    def _outcome(self, e: Exception | None, result, retry_on, retry_if_result) -> bool:
+        # returns True when the attempt should be retried
+        if e is not None:
+            if not retry_on(e):
+                raise e
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            return True
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return retry_if_result is not None and retry_if_result(result)
+
+    def call(self, fn, retry_on=lambda e: False, retry_if_result=None):
+        """Call `fn()` until it succeeds, retrying exceptions matching `retry_on`
+        and results matching `retry_if_result`."""
+        last_error = None
+        try:
+            for _ in self.attempts():
+                try:
+                    result, error = fn(), None
+                except Exception as e:
+                    result, error = None, e
+                if self._outcome(error, result, retry_on, retry_if_result):
+                    last_error = error
+                    continue
+                return result
+        except RetryError as e:
+            raise e from last_error
+
+    async def call_async(self, fn, retry_on=lambda e: False, retry_if_result=None):
+        """Like call(), for a coroutine function; waits with asyncio.sleep."""
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                result, error = await fn(), None
+            except Exception as e:
+                result, error = None, e
+            if not self._outcome(error, result, retry_on, retry_if_result):
+                return result
+            try:
+                delay = self._next_delay(attempt, started)
+            except RetryError as e:
+                raise e from error
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "give_ups": self.give_ups,
+            "circuit": self.breaker.state if self.breaker is not None else None,
+        }
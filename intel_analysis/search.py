@@ -0,0 +1,174 @@
+import logging
+from datetime import datetime
+
+from intel_analysis.backends import ElasticsearchBackend, SearchBackend, UnsupportedQuery
+from intel_analysis.cache import QueryCache
+from intel_analysis.content_filter import content_filtered
+from intel_analysis.expansion import ExpansionCache, sparse_vector_query
+from intel_analysis.llm_cache import LLMResponseCache
+from intel_analysis.metrics import record_usage
+from intel_analysis.prompts import LLM_SYSTEM_PROMPT, rag_prompt
+from intel_analysis.queries import (
+    ELSER_INFERENCE_ID,
+    basic_hits,
+    basic_query,
+    elser_hits,
+    elser_query,
+    hybrid_query,
+)
+from intel_analysis.query_compiler import compile_filters
+from intel_analysis.ratelimit import TokenBucket
+from intel_analysis.retry import RetryPolicy, openai_retryable
+from intel_analysis.tracing import span
+
+
+class SearchService:
+    """The app's search methods (basic, ELSER, hybrid, LLM, RAG) with no UI.
+
+    Shared by the Streamlit app and the headless query runner. Searches go
+    to `backend`, Elasticsearch unless another one is given. Every cache,
+    and the LLM rate limiter, is optional. Safe to call from several threads
+    as long as the clients are.
+    """
+
+    def __init__(
+        self,
+        es,
+        index: str,
+        llm_client,
+        model_name: str,
+        es_retry: RetryPolicy | None = None,
+        llm_retry: RetryPolicy | None = None,
+        query_cache: QueryCache | None = None,
+        expansions: ExpansionCache | None = None,
+        llm_cache: LLMResponseCache | None = None,
+        llm_limiter: TokenBucket | None = None,
+        context_max_tokens: int = 1500,
+        today: str | None = None,
+        backend: SearchBackend | None = None,
+    ):
+        self.es = es
+        self.index = index
+        self.llm_client = llm_client
+        self.model_name = model_name
+        self.es_retry = es_retry or RetryPolicy("Elasticsearch")
+        self.llm_retry = llm_retry or RetryPolicy("LLM")
+        self.query_cache = query_cache
+        self.expansions = expansions
+        self.llm_cache = llm_cache
+        self.llm_limiter = llm_limiter
+        self.context_max_tokens = context_max_tokens
+        self.today = today or datetime.today().strftime("%A, %B %d, %Y")
+        self.backend = backend or ElasticsearchBackend(es, index, self.es_retry)
+
+    def es_search(self, es_query: dict) -> dict:
+        with span("es_fetch"):
+            return self.backend.search(es_query)
+
+    def _retrieve(self, method: str, query_text: str, search_filters: list, run_search) -> dict:
+        with span(f"retrieval.{method}"):
+            if self.query_cache is None:
+                return run_search()
+            return self.query_cache.get_or_search(method, query_text, search_filters, run_search)
+
+    def _sparse_vector(self, query_text: str) -> dict:
+        if not self.backend.supports_sparse_vector:
+            raise UnsupportedQuery(f"ELSER search isn't available with the {self.backend.name} search backend")
+        # without the expansion cache, ELSER inference runs inside the search (es_fetch)
+        with span("elser_expansion"):
+            return sparse_vector_query(
+                "details_embeddings", ELSER_INFERENCE_ID, query_text, es=self.es, expansions=self.expansions
+            )
+
+    def basic(self, query_text: str, filters: dict) -> dict:
+        logging.info(f"Performing Elasticsearch basic query for user search: {query_text}")
+        search_filters = compile_filters(filters)
+
+        def run_search():
+            res = self.es_search(basic_query(query_text, search_filters))
+            return {"source_docs": basic_hits(res)}
+
+        return self._retrieve("basic", query_text, search_filters, run_search)
+
+    def elser(self, query_text: str, filters: dict) -> dict:
+        logging.info(f"Performing Elasticsearch sparse vector query for user search: {query_text}")
+        search_filters = compile_filters(filters)
+
+        def run_search():
+            res = self.es_search(elser_query(self._sparse_vector(query_text), search_filters))
+            return {"source_docs": elser_hits(res)}
+
+        return self._retrieve("elser", query_text, search_filters, run_search)
+
+    def hybrid(self, query_text: str, filters: dict) -> dict:
+        logging.info(f"Performing Elasticsearch hybrid (RRF) query for user search: {query_text}")
+        search_filters = compile_filters(filters)
+
+        def run_search():
+            res = self.es_search(hybrid_query(query_text, self._sparse_vector(query_text), search_filters))
+            return {"source_docs": elser_hits(res)}
+
+        return self._retrieve("hybrid", query_text, search_filters, run_search)
+
+    def build_prompt(self, es_hits: list, query_text: str) -> str:
+        with span("prompt"):
+            return rag_prompt(es_hits, query_text, self.today, self.context_max_tokens)
+
+    def _complete(self, messages: list, retry_if_result=None):
+        def create():
+            if self.llm_limiter is not None:
+                self.llm_limiter.acquire()
+            return self.llm_client.chat.completions.create(
+                temperature=0, model=self.model_name, messages=messages
+            )
+
+        with span("llm"):
+            response = self.llm_retry.call(create, retry_on=openai_retryable, retry_if_result=retry_if_result)
+        record_usage(response)
+        return response.choices[0].message.content.strip()
+
+    def llm(self, query_text: str) -> dict:
+        logging.info(f"Performing LLM passthrough query for user search: {query_text}")
+        cache_key = LLMResponseCache.key(self.model_name, LLM_SYSTEM_PROMPT, query_text)
+        if self.llm_cache is not None:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return {"llm_response": cached}
+
+        answer = self._complete(
+            [
+                {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                {"role": "user", "content": query_text},
+            ]
+        )
+        if self.llm_cache is not None:
+            self.llm_cache.set(cache_key, answer)
+        return {"llm_response": answer}
+
+    def rag(self, query_text: str, filters: dict, retriever=None) -> dict:
+        # `retriever(query_text, filters)` returns {"source_docs": [...]}; ELSER by default
+        retriever = retriever or self.elser
+        logging.info(f"Performing RAG query for user search: {query_text}")
+        es_hits = retriever(query_text, filters)["source_docs"]
+        prompt = self.build_prompt(es_hits, query_text)
+
+        cache_key = LLMResponseCache.key(
+            self.model_name, prompt, query_text, [hit["report_id"] for hit in es_hits]
+        )
+        if self.llm_cache is not None:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return {"llm_response": cached, "source_docs": es_hits}
+
+        logging.info("Performing RAG search step 2 to LLM using Elasticsearch results as context")
+        # retried (with backoff, up to a limit) when the answer gets caught by the content filter
+        answer = self._complete(
+            [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": query_text},
+            ],
+            retry_if_result=content_filtered,
+        )
+        if self.llm_cache is not None:
+            self.llm_cache.set(cache_key, answer)
+        return {"llm_response": answer, "source_docs": es_hits}
@@ -0,0 +1,35 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+from elasticsearch.serializer import JsonSerializer
+
+try:
+    from elasticsearch.serializer import OrjsonSerializer
+except ImportError:
+    OrjsonSerializer = None
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON, as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def es_serializers() -> dict:
+    # faster encoding of search requests and decoding of responses, when orjson is installed
+    serializer = OrjsonSerializer() if OrjsonSerializer is not None and orjson is not None else JsonSerializer()
+    return {
+        "application/json": serializer,
+        "application/vnd.elasticsearch+json": serializer,
+    }
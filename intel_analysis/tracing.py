@@ -0,0 +1,56 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from intel_analysis.metrics import STAGE_ERRORS, STAGE_SECONDS
+
+_current = contextvars.ContextVar("intel_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while handling one query, in start order."""
+
+    def __init__(self):
+        self.spans = []
+        self.depth = 0
+
+    def rows(self) -> list:
+        return [
+            {"stage": "  " * depth + name, "ms": round(seconds * 1000, 1)}
+            for name, depth, seconds in self.spans
+            if seconds is not None
+        ]
+
+
+@contextmanager
+def trace():
+    """Collect the spans of everything run inside the block on this thread."""
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage: always observed in the stage histogram, and added to the
+    current trace (if there is one) nested under any enclosing span."""
+    current = _current.get()
+    if current is not None:
+        slot = len(current.spans)
+        current.spans.append((name, current.depth, None))
+        current.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if current is not None:
+            current.depth -= 1
+            current.spans[slot] = (name, current.depth, elapsed)
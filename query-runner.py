@@ -0,0 +1,224 @@
+import argparse
+import logging
+import os
+import statistics
+import time
+import tomllib
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from intel_analysis.clients import connect_es, connect_llm, es_credentials, use_local_search
+from intel_analysis.expansion import ExpansionCache
+from intel_analysis.llm_cache import LLMResponseCache
+from intel_analysis.local_index import build_local_index
+from intel_analysis.ratelimit import TokenBucket
+from intel_analysis.refdata import load_reference_data
+from intel_analysis.retry import CircuitBreaker, RetryPolicy
+from intel_analysis.search import SearchService
+from intel_analysis.serialization import dumps, loads
+
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
+logging.getLogger("requests").setLevel(logging.WARNING)
+logging.getLogger("urllib3").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("elasticsearch").setLevel(logging.WARNING)
+logging.getLogger("elastic_transport").setLevel(logging.WARNING)
+
+METHODS = ("basic", "elser", "hybrid", "llm", "rag", "rag-hybrid")
+
+NO_FILTERS = {"date_range": "All Time", "classifications": [], "sources": [], "countries": [], "compartments": []}
+
+
+def read_config(config_path):
+    logging.info("Reading config.toml")
+    with open(config_path, "rb") as f:
+        config_data = tomllib.load(f)
+
+    return config_data
+
+
+def read_queries(path: str, field: str) -> list:
+    # JSONL records (query text under `field`) or plain text, one query per line
+    queries = []
+    with open(path, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = loads(line)
+            except ValueError:
+                record = line.decode("utf-8")
+            if isinstance(record, dict):
+                if not isinstance(record.get(field), str):
+                    logging.warning(f"Skipping line {line_number} of {path}: no {field!r} text (choose the field with --field)")
+                    continue
+                query_id = str(record.get("id") or record.get("request_id") or line_number)
+                queries.append((query_id, record[field]))
+            else:
+                queries.append((str(line_number), str(record)))
+    return queries
+
+
+def completed(output_path: str) -> set:
+    # (query id, method) pairs already answered; failures are run again on resume
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = loads(line)
+            except ValueError:
+                # a line cut short by an interrupted run
+                continue
+            if "error" not in record:
+                done.add((record["id"], record["method"]))
+    return done
+
+
+def end_partial_line(output_path: str):
+    # an interrupted run can leave a cut-off last line; end it so the next record starts on its own line
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def run_query(searcher: SearchService, method: str, query_id: str, query_text: str, filters: dict) -> dict:
+    record = {"id": query_id, "method": method, "query": query_text}
+    start = time.perf_counter()
+    try:
+        if method == "basic":
+            response = searcher.basic(query_text, filters)
+        elif method == "elser":
+            response = searcher.elser(query_text, filters)
+        elif method == "hybrid":
+            response = searcher.hybrid(query_text, filters)
+        elif method == "llm":
+            response = searcher.llm(query_text)
+        elif method == "rag":
+            response = searcher.rag(query_text, filters)
+        else:
+            response = searcher.rag(query_text, filters, searcher.hybrid)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        response = {}
+    record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if "llm_response" in response:
+        record["llm_response"] = response["llm_response"]
+    if "source_docs" in response:
+        record["report_ids"] = [doc.get("report_id") for doc in response["source_docs"]]
+    return record
+
+
+def summarize(records: list, elapsed: float, limiter: TokenBucket | None):
+    by_method = defaultdict(list)
+    errors = defaultdict(int)
+    for record in records:
+        if "error" in record:
+            errors[record["method"]] += 1
+        else:
+            by_method[record["method"]].append(record["latency_ms"])
+
+    print(f"{len(records)} queries in {elapsed:.1f}s ({len(records) / elapsed if elapsed else 0:.1f}/s)")
+    for method in METHODS:
+        latencies = by_method.get(method, [])
+        if not latencies and not errors.get(method):
+            continue
+        line = f"{method:>10}: {len(latencies)} ok, {errors.get(method, 0)} failed"
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            line += f", p50 {cuts[49]:.0f}ms, p95 {cuts[94]:.0f}ms, p99 {cuts[98]:.0f}ms"
+        elif latencies:
+            line += f", {latencies[0]:.0f}ms"
+        print(line)
+    if limiter is not None:
+        print(f"LLM rate limit: {limiter.waited:.1f}s spent waiting for tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a file of queries through the search/RAG methods and write the results as NDJSON"
+    )
+    parser.add_argument("-c", "--config", action="store", dest="config_path", default="config.toml")
+    parser.add_argument("-i", "--input", action="store", required=True, help="JSONL or one-query-per-line text file")
+    parser.add_argument("-f", "--field", action="store", default="query", help="query text field in JSONL records")
+    parser.add_argument("-o", "--output", action="store", default="query-results.ndjson",
+                        help="results file; rerunning with the same file resumes where it stopped")
+    parser.add_argument("-m", "--methods", action="store", nargs="+", choices=METHODS, default=["basic", "elser", "rag"])
+    parser.add_argument("-w", "--workers", action="store", type=int, default=8)
+    parser.add_argument("--llm-rate", action="store", type=float, default=None, help="max LLM requests per second")
+    parser.add_argument("--llm-burst", action="store", type=float, default=None, help="LLM requests allowed in a burst")
+    parser.add_argument("--filters", action="store", default=None, help="sidebar-style filters as JSON")
+    args = parser.parse_args()
+
+    config_data = read_config(args.config_path)
+    filters = NO_FILTERS | (loads(args.filters) if args.filters else {})
+
+    # the local backend runs without a cluster, so it needs no Elasticsearch config
+    es = None if use_local_search(config_data) else connect_es(config_data, es_credentials(config_data)[0])
+    llm_client, model_name = connect_llm(config_data)
+
+    max_attempts = config_data.get("RETRY_MAX_ATTEMPTS", 4)
+    deadline = config_data.get("RETRY_DEADLINE_SECONDS", 30)
+    limiter = TokenBucket(args.llm_rate, args.llm_burst) if args.llm_rate else None
+    expansions = None
+    if config_data.get("ELSER_EXPANSION_CACHE", "false").lower() == "true":
+        expansions = ExpansionCache(maxsize=config_data.get("ELSER_EXPANSION_CACHE_SIZE", 10_000))
+    llm_cache = None
+    if "LLM_CACHE_PATH" in config_data:
+        llm_cache = LLMResponseCache(config_data["LLM_CACHE_PATH"], max_entries=config_data.get("LLM_CACHE_MAX_ENTRIES", 10_000))
+
+    backend = None
+    if use_local_search(config_data):
+        backend = build_local_index(load_reference_data("data"), config_data.get("LOCAL_INDEX_REPORTS", 10_000))
+
+    searcher = SearchService(
+        es,
+        config_data["ELASTIC_INDEX"],
+        llm_client,
+        model_name,
+        es_retry=RetryPolicy("Elasticsearch", max_attempts=max_attempts, deadline=deadline, breaker=CircuitBreaker("Elasticsearch")),
+        llm_retry=RetryPolicy("LLM", max_attempts=max_attempts, deadline=deadline, breaker=CircuitBreaker("LLM")),
+        expansions=expansions,
+        llm_cache=llm_cache,
+        llm_limiter=limiter,
+        context_max_tokens=config_data.get("RAG_CONTEXT_MAX_TOKENS", 1500),
+        backend=backend,
+    )
+
+    queries = read_queries(args.input, args.field)
+    done = completed(args.output)
+    tasks = deque(
+        (query_id, query_text, method)
+        for query_id, query_text in queries
+        for method in args.methods
+        if (query_id, method) not in done
+    )
+    logging.info(f"{len(queries)} queries x {len(args.methods)} methods: {len(done)} done, {len(tasks)} to run")
+
+    end_partial_line(args.output)
+    records = []
+    start = time.perf_counter()
+    with open(args.output, "ab") as out, ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="query") as executor:
+        pending = set()
+        while tasks or pending:
+            # a couple of queries per worker in flight; results are written as they finish
+            while tasks and len(pending) < args.workers * 2:
+                query_id, query_text, method = tasks.popleft()
+                pending.add(executor.submit(run_query, searcher, method, query_id, query_text, filters))
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                # each line is a checkpoint: an interrupted run resumes after the last one written
+                out.write(dumps(record) + b"\n")
+                out.flush()
+                records.append(record)
+                if len(records) % 100 == 0:
+                    logging.info(f"{len(records)} queries run")
+
+    summarize(records, time.perf_counter() - start, limiter)
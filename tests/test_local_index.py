@@ -0,0 +1,77 @@
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from intel_analysis.ingest import report_stream
+from intel_analysis.local_index import LocalIndex
+from intel_analysis.queries import basic_query
+from intel_analysis.query_compiler import compile_filters
+from intel_analysis.refdata import load_reference_data
+
+QUERIES = [
+    "cyber attack on financial institutions",
+    "What is the latest intelligence on chemical weapons?",
+    "smuggling routes",
+    "is on the",
+    "the",
+    "zzzz",
+]
+
+FILTERS = [
+    {"date_range": "All Time"},
+    {"date_range": "Last 30 Days", "classifications": ["SUPER SECRET"]},
+    {"date_range": "This Year", "sources": ["Human intelligence (HUMINT)", "Signals intelligence (SIGINT)"], "countries": ["Iran"]},
+]
+
+
+class LocalIndexTopKTest(unittest.TestCase):
+    """The pruned top-k returns the same scores as scoring every doc."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.reference_data = load_reference_data("data")
+        cls.index = LocalIndex(report_stream(cls.reference_data, 5000, seed=0, columnar=True))
+
+    def exhaustive(self, index: LocalIndex, terms: dict, mask, k: int) -> list:
+        scores = np.zeros(index.count, dtype=np.float32)
+        for term, weight in terms.items():
+            start, end = index.offsets[term], index.offsets[term + 1]
+            scores[index.doc_ids[start:end]] += weight * index.impacts[start:end]
+        if mask is not None:
+            scores[~mask] = 0
+        return sorted(scores[scores > 0], reverse=True)[:k]
+
+    def terms(self, index: LocalIndex, query_text: str) -> dict:
+        return dict(Counter(index.vocabulary[word] for word in index._query_words(query_text)))
+
+    def test_search_matches_exhaustive_scoring(self):
+        for query_text in QUERIES:
+            for filters in FILTERS:
+                with self.subTest(query=query_text, filters=filters):
+                    clauses = compile_filters({"classifications": [], "sources": [], "countries": [], "compartments": []} | filters)
+                    body = basic_query(query_text, clauses)
+                    body["size"] = 10
+                    hits = self.index.search(body)["hits"]["hits"]
+                    terms = self.terms(self.index, query_text)
+                    expected = self.exhaustive(self.index, terms, self.index._filter_mask(clauses), 10) if terms else []
+                    self.assertEqual(len(hits), len(expected))
+                    np.testing.assert_allclose([hit["_score"] for hit in hits], expected, rtol=1e-5)
+
+    def test_top_k_on_small_indices(self):
+        # fewer matching docs than k, empty and sparse masks
+        for count in (0, 5, 300):
+            index = LocalIndex(report_stream(self.reference_data, count, seed=3, columnar=True))
+            for query_text in QUERIES[:4]:
+                terms = self.terms(index, query_text)
+                if not terms:
+                    continue
+                for mask in (None, np.zeros(index.count, dtype=bool), np.arange(index.count) % 3 == 0):
+                    for k in (1, 10, 1000):
+                        with self.subTest(count=count, query=query_text, k=k):
+                            _, scores = index.top_k(terms, mask, k)
+                            np.testing.assert_allclose(scores, self.exhaustive(index, terms, mask, k), rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()